@@ -1,81 +1,159 @@
 import pygame
 import os
-import sys
 import random
+from array import array
+from bisect import bisect_right
 from os.path import join
 
-# -------------------- Initialization --------------------
-pygame.font.init()
-pygame.mixer.init()
+from resources import resource_path, load_image, load_font as load_shared_font, render_text, GlyphStrip
+from render import DirtyRenderer, get_window
+from profiler import FrameProfiler
+from replay import start_recording, finish_recording, new_seed
 
 WIDTH, HEIGHT = 900, 500
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
 
 # -------------------- Helper Functions --------------------
-def resource_path(relative_path):
-    """
-    Get absolute path to resource, works for dev and PyInstaller.
-    """
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return join(base_path, relative_path)
-
 def load_font(size):
-    return pygame.font.Font(resource_path(join("assets", "Menu", "text", "Platform.TTF")), size)
-
-DODGER_FONT = load_font(40)
+    return load_shared_font(join("assets", "Menu", "Text", "Platform.TTF"), size)
 
 # -------------------- Drawing --------------------
-def draw_window_dodger(WIN, bg, player, obstacles, score, font):
-    WIN.blit(bg, (0, 0))
-    WIN.blit(player['img'], (player['rect'].x, player['rect'].y))
-
-    for obs in obstacles:
-        pygame.draw.rect(WIN, "red", obs)
-
-    score_text = font.render(f"Score: {int(score)}", True, "white")
-    WIN.blit(score_text, (10, 10))
-    pygame.display.update()
-
-# -------------------- Main Dodger Game --------------------
-def main_dodger():
-    ASSETS_FOLDER = resource_path(join("assets", "Dual_game"))
-
-    FPS = 60
-    PLAYER_VEL = 5
-    OBSTACLE_VEL = 6
-    OBSTACLE_WIDTH = 40
-    OBSTACLE_HEIGHT = 40
-    SPAWN_RATE = 30
-
-    # Load assets
-    bg = pygame.transform.scale(pygame.image.load(join(ASSETS_FOLDER, "space.png")), (WIDTH, HEIGHT))
-    player_img = pygame.transform.scale(
-        pygame.image.load(join(ASSETS_FOLDER, "spaceship_yellow.png")),
-        (50, 35)
+def draw_window_dodger(renderer, player, obstacles, score, font, digits):
+    renderer.begin()
+    renderer.blit(player['img'], (player['rect'].x, player['rect'].y))
+
+    obstacles.draw(renderer)
+
+    # The label comes from the text cache and the number from pre-rendered digits
+    label = render_text(font, "Score: ", "white")
+    renderer.blit(label, (10, 10))
+    digits.draw(renderer, str(int(score)), (10 + label.get_width(), 10))
+    renderer.present()
+
+# -------------------- Game State --------------------
+ASSETS_FOLDER = resource_path(join("assets", "Dual_game"))
+
+FPS = 60
+PLAYER_VEL = 5
+OBSTACLE_VEL = 6
+OBSTACLE_SIZE = 40
+SPAWN_RATE = 30
+OBSTACLE_COLOR = "red"
+
+# Difficulty ramp: from the fixed values above at score 0 to these at RAMP_SCORE
+# (about 100 seconds in), where a screen holds well over a thousand obstacles.
+# Opt in with ARCADE_DODGER_RAMP=1; it is mainly a stress profile, since the
+# late waves leave no gap wide enough for the ship.
+RAMP_MODE = os.environ.get("ARCADE_DODGER_RAMP", "0") == "1"
+RAMP_SCORE = 300
+MIN_SPAWN_RATE = 2
+MAX_WAVE_COUNT = 100
+MAX_OBSTACLE_VEL = 14
+MIN_OBSTACLE_SIZE = 12
+
+def ramp_difficulty(score):
+    # (frames between waves, obstacles per wave, speed, size) at this score
+    t = min(1.0, score / RAMP_SCORE)
+    return (
+        round(SPAWN_RATE + (MIN_SPAWN_RATE - SPAWN_RATE) * t),
+        1 + int((MAX_WAVE_COUNT - 1) * t * t),
+        OBSTACLE_VEL + (MAX_OBSTACLE_VEL - OBSTACLE_VEL) * t,
+        round(OBSTACLE_SIZE + (MIN_OBSTACLE_SIZE - OBSTACLE_SIZE) * t),
     )
 
-    player = {"img": player_img, "rect": pygame.Rect(WIDTH // 2, HEIGHT - 80, 50, 35)}
+# -------------------- Obstacles --------------------
+_obstacle_surfaces = {}
 
-    obstacles = []
-    frame = 0
-    score = 0
-    clock = pygame.time.Clock()
-    run = True
+def obstacle_surface(size):
+    surf = _obstacle_surfaces.get(size)
+    if surf is None:
+        surf = _obstacle_surfaces[size] = pygame.Surface((size, size))
+        surf.fill(OBSTACLE_COLOR)
+    return surf
 
-    while run:
-        clock.tick(FPS)
-        frame += 1
-        score += 0.05
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return
+class ObstacleField:
+    """
+    Falling obstacles, stored by wave. Everything spawned together shares one
+    y, speed and size, so a wave is those three numbers and a sorted array of
+    x positions: moving is one addition per wave, culling drops whole waves and
+    a hit test is a row check plus a bisect per wave, whatever the obstacle count.
+    """
+    def __init__(self):
+        self.waves = []     # [y, speed, size, xs]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, xs, speed, size):
+        self.waves.append([float(-size), float(speed), size, array('i', sorted(xs))])
+        self.count += len(xs)
+
+    def move(self):
+        off_screen = False
+        for wave in self.waves:
+            wave[0] += wave[1]
+            off_screen = off_screen or wave[0] > HEIGHT
+        if off_screen:
+            self.waves = [wave for wave in self.waves if wave[0] <= HEIGHT]
+            self.count = sum(len(wave[3]) for wave in self.waves)
+
+    def collides(self, rect):
+        # Same test as Rect.colliderect against every obstacle
+        for y, _, size, xs in self.waves:
+            top = int(y)
+            if top < rect.bottom and top + size > rect.top:
+                i = bisect_right(xs, rect.left - size)
+                if i < len(xs) and xs[i] < rect.right:
+                    return True
+        return False
+
+    def draw(self, renderer):
+        for y, _, size, xs in self.waves:
+            top = int(y)
+            renderer.blits(obstacle_surface(size), [(x, top) for x in xs],
+                           pygame.Rect(xs[0], top, xs[-1] + size - xs[0], size))
+
+# -------------------- Game State --------------------
+class DodgerGame:
+    """
+    One run of Space Dodger: stepped with a key state each frame, with drawing
+    kept separate. With ramp=True spawn rate, wave size, speed and obstacle
+    size follow ramp_difficulty(score) instead of the fixed settings. Obstacle
+    placement comes from `seed`; a recorder (see replay.py) gets every step's keys.
+    """
+    def __init__(self, spawn_rate=SPAWN_RATE, spawn_count=1, ramp=False, seed=None, recorder=None):
+        self.spawn_rate = spawn_rate
+        self.spawn_count = spawn_count
+        self.ramp = ramp
+        self.rng = random.Random(seed)
+        self.recorder = recorder
+
+        # Load assets
+        self.bg = pygame.transform.scale(load_image(join(ASSETS_FOLDER, "bg.jpeg"), 'opaque'), (WIDTH, HEIGHT))
+        player_img = pygame.transform.scale(
+            load_image(join(ASSETS_FOLDER, "spaceship_yellow.png")),
+            (50, 35)
+        )
+
+        self.player = {"img": player_img, "rect": pygame.Rect(WIDTH // 2, HEIGHT - 80, 50, 35)}
+        self.obstacles = ObstacleField()
+        self.font = load_font(40)
+        self.score_digits = GlyphStrip(self.font, "white")
+        self.frame = 0
+        self.spawn_timer = 0
+        self.score = 0
+
+    def step(self, keys):
+        # Returns True when the ship is hit
+        player = self.player
+        obstacles = self.obstacles
+        if self.recorder is not None:
+            self.recorder.record(keys)
+        self.frame += 1
+        self.score += 0.05
 
         # Player movement
-        keys = pygame.key.get_pressed()
         if keys[pygame.K_a] and player['rect'].x - PLAYER_VEL > 0:
             player['rect'].x -= PLAYER_VEL
         if keys[pygame.K_d] and player['rect'].x + player['rect'].width + PLAYER_VEL < WIDTH:
@@ -86,21 +164,55 @@ def main_dodger():
             player['rect'].y += PLAYER_VEL
 
         # Spawn obstacles
-        if frame % SPAWN_RATE == 0:
-            x_pos = random.randint(0, WIDTH - OBSTACLE_WIDTH)
-            obstacles.append(pygame.Rect(x_pos, -OBSTACLE_HEIGHT, OBSTACLE_WIDTH, OBSTACLE_HEIGHT))
+        if self.ramp:
+            spawn_rate, spawn_count, speed, size = ramp_difficulty(self.score)
+        else:
+            spawn_rate, spawn_count, speed, size = self.spawn_rate, self.spawn_count, OBSTACLE_VEL, OBSTACLE_SIZE
+        self.spawn_timer += 1
+        if self.spawn_timer >= spawn_rate:
+            self.spawn_timer = 0
+            obstacles.spawn([self.rng.randint(0, WIDTH - size) for _ in range(spawn_count)], speed, size)
 
         # Move obstacles and check collisions
-        for obs in obstacles[:]:
-            obs.y += OBSTACLE_VEL
-            if obs.y > HEIGHT:
-                obstacles.remove(obs)
+        obstacles.move()
+        return obstacles.collides(player['rect'])
+
+    def draw(self, renderer):
+        draw_window_dodger(renderer, self.player, self.obstacles, self.score, self.font, self.score_digits)
+
+# -------------------- Main Dodger Game --------------------
+def main_dodger():
+    window = get_window((WIDTH, HEIGHT))
+    settings = {'ramp': RAMP_MODE, 'seed': new_seed()}
+    recorder = start_recording('dodger', settings)
+    dodger = DodgerGame(recorder=recorder, **settings)
+    profiler = FrameProfiler()
+    renderer = DirtyRenderer(window, dodger.bg, profiler=profiler)
+
+    clock = pygame.time.Clock()
+    run = True
+
+    while run:
+        clock.tick(FPS)
+        profiler.begin_frame()
 
-            if obs.colliderect(player['rect']):
-                pygame.time.delay(1000)
+        for event in pygame.event.get():
+            renderer.handle_event(event)
+            profiler.handle_event(event)
+            if event.type == pygame.QUIT:
+                finish_recording(recorder, dodger)
                 return
+        profiler.mark('events')
+
+        hit = dodger.step(pygame.key.get_pressed())
+        profiler.mark('update')
+        if hit:
+            finish_recording(recorder, dodger)
+            pygame.time.delay(1000)
+            return
 
-        draw_window_dodger(WIN, bg, player, obstacles, score, DODGER_FONT)
+        dodger.draw(renderer)
+        profiler.end_frame({'obstacles': len(dodger.obstacles)})
 
 # -------------------- Run --------------------
 if __name__ == "__main__":
@@ -1,52 +1,43 @@
+import time
+STARTED = time.perf_counter()
+
 import pygame
-import os
 import sys
 from os.path import join
 
-from one_v_one import main_shooter
-from Space_dodger import main_dodger
-from game import main_menu, main as platformer_main   # <-- IMPORTANT FIX
-
-pygame.font.init()
-pygame.mixer.init()
+# The games themselves are imported when their cabinet is clicked
+from resources import load_image, load_font as load_shared_font, PREFETCHER
+from render import DirtyRenderer, get_window
+from audio import AUDIO
+from profiler import FrameProfiler
 
 WIDTH, HEIGHT = 900, 500
-pygame.display.set_caption("Pygame Arcade Launcher")
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
 
-# --------------------------
-# Resource path function
-# --------------------------
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and PyInstaller """
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+# `python arcade.py --startup-time` prints how long the launcher took to show its first frame, then exits
+STARTUP_TIME = "--startup-time" in sys.argv
 
 # --------------------------
 # Load font via resource_path
 # --------------------------
 def load_font(size):
-    return pygame.font.Font(resource_path(join("assets", "Menu", "text", "Platform.TTF")), size)
-
-LAUNCHER_TITLE_FONT = load_font(70)
-LAUNCHER_LABEL_FONT = load_font(25)
+    return load_shared_font(join("assets", "Menu", "Text", "Platform.TTF"), size)
 
 # --------------------------
 # Launcher screen
 # --------------------------
 def launcher_screen():
+    imported = time.perf_counter()
+    window = get_window((WIDTH, HEIGHT), "Pygame Arcade Launcher")
+    window_ready = time.perf_counter()
     ASSETS_FOLDER = join("assets", "Dual_game")
     
     # Load background and arcade images using resource_path
     launcher_bg = pygame.transform.scale(
-        pygame.image.load(resource_path(join(ASSETS_FOLDER, 'Arcade_BG.png'))),
+        load_image(join(ASSETS_FOLDER, 'Arcade_BG.png'), 'opaque'),
         (WIDTH, HEIGHT)
     )
     arcade_img = pygame.transform.scale(
-        pygame.image.load(resource_path(join(ASSETS_FOLDER, 'arcade.png'))),
+        load_image(join(ASSETS_FOLDER, 'arcade.png')),
         (250, 350)
     )
 
@@ -56,24 +47,41 @@ def launcher_screen():
     arcade3 = arcade_img.get_rect(center=(WIDTH//2 + 250, HEIGHT//2 + 75))
 
     # Labels
-    label1 = LAUNCHER_LABEL_FONT.render("1v1 Shooter", True, "white")
-    label2 = LAUNCHER_LABEL_FONT.render("Space Dodger", True, "black")
-    label3 = LAUNCHER_LABEL_FONT.render("Platformer", True, "white")
+    label1 = load_font(25).render("1v1 Shooter", True, "white")
+    label2 = load_font(25).render("Space Dodger", True, "black")
+    label3 = load_font(25).render("Platformer", True, "white")
 
     label1_rect = label1.get_rect(center=(arcade1.centerx, arcade1.bottom - 30))
     label2_rect = label2.get_rect(center=(arcade2.centerx, arcade2.bottom - 30))
     label3_rect = label3.get_rect(center=(arcade3.centerx, arcade3.bottom - 30))
 
     # Title
-    title_text = LAUNCHER_TITLE_FONT.render("PYGAME ARCADE", True, "white")
+    title_text = load_font(70).render("PYGAME ARCADE", True, "white")
     title_rect = title_text.get_rect(center=(WIDTH // 2, 50))
 
+    # The launcher never changes between clicks, so it is composed once
+    scene = launcher_bg.copy()
+    scene.blit(arcade_img, arcade1)
+    scene.blit(arcade_img, arcade2)
+    scene.blit(arcade_img, arcade3)
+
+    scene.blit(title_text, title_rect)
+    scene.blit(label1, label1_rect)
+    scene.blit(label2, label2_rect)
+    scene.blit(label3, label3_rect)
+    profiler = FrameProfiler()
+    renderer = DirtyRenderer(window, scene, profiler=profiler)
+
     clock = pygame.time.Clock()
+    prefetching = False
     run = True
 
     while run:
         clock.tick(60)
+        profiler.begin_frame()
         for event in pygame.event.get():
+            renderer.handle_event(event)
+            profiler.handle_event(event)
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -83,30 +91,49 @@ def launcher_screen():
 
                 # 1v1 Shooter
                 if arcade1.collidepoint(pos):
+                    from one_v_one import main_shooter
                     main_shooter()
+                    renderer.invalidate()
 
                 # Space Dodger
                 elif arcade2.collidepoint(pos):
+                    from Space_dodger import main_dodger
                     main_dodger()
+                    renderer.invalidate()
 
                 # Platformer
                 elif arcade3.collidepoint(pos):
-                    selected_map = main_menu(WIN)
+                    from game import main_menu, main as platformer_main
+                    selected_map = main_menu(window)
                     if selected_map not in [None, "quit"]:
-                        platformer_main(WIN, selected_map)
+                        platformer_main(window, selected_map)
+                    # The level music stops at the launcher, but not between levels and the level menu
+                    AUDIO.stop_music(500)
+                    renderer.invalidate()
 
-        # Draw everything
-        WIN.blit(launcher_bg, (0, 0))
-        WIN.blit(arcade_img, arcade1)
-        WIN.blit(arcade_img, arcade2)
-        WIN.blit(arcade_img, arcade3)
+        profiler.mark('events')
 
-        WIN.blit(title_text, title_rect)
-        WIN.blit(label1, label1_rect)
-        WIN.blit(label2, label2_rect)
-        WIN.blit(label3, label3_rect)
-
-        pygame.display.update()
+        # Draw everything
+        renderer.begin()
+        renderer.present()
+        profiler.end_frame()
+
+        if STARTUP_TIME:
+            shown = time.perf_counter()
+            print(f"imports      {(imported - STARTED) * 1000:8.1f} ms")
+            print(f"window       {(window_ready - imported) * 1000:8.1f} ms")
+            print(f"assets+draw  {(shown - window_ready) * 1000:8.1f} ms")
+            print(f"first frame  {(shown - STARTED) * 1000:8.1f} ms")
+            return
+
+        # Once the launcher is on screen, the Platformer (the slowest game to open) and the shooter's sounds load in the background
+        if not prefetching:
+            from game import prefetch_platformer
+            from one_v_one import prefetch_shooter
+            prefetch_platformer()
+            prefetch_shooter()
+            prefetching = True
+        PREFETCHER.pump()
 
 
 if __name__ == "__main__":
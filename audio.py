@@ -0,0 +1,111 @@
+import pygame
+import os
+
+from resources import resource_path
+
+# -----------------------------
+# Channel pools
+# -----------------------------
+# Each category of effect plays on channels reserved for it, so a burst of
+# shots can never take the channels the hit sounds need. When every channel
+# in a pool is busy, the voice that started first is cut off for the new one.
+CHANNEL_POOLS = {'shot': 4, 'impact': 3}
+FREE_CHANNELS = 2       # left unreserved for plain Sound.play()
+RETRIGGER_MS = 20       # the same sound from the same source asked for again this soon plays once
+
+class ChannelPool:
+    def __init__(self, channels):
+        self.channels = channels
+        self.started = [0] * len(channels)    # play order; the lowest is the oldest voice
+        self.serial = 0
+        self.last_played = {}                 # (sound, source) -> when it last started
+        self.steals = 0
+
+    def play(self, sound, now, source=None):
+        # Only repeats from one source collapse; two players firing on the same frame are both heard
+        key = (sound, source)
+        last = self.last_played.get(key)
+        if last is not None and now - last < RETRIGGER_MS:
+            return None
+        self.last_played[key] = now
+
+        channels = self.channels
+        slot = None
+        for i, channel in enumerate(channels):
+            if not channel.get_busy():
+                slot = i
+                break
+        if slot is None:
+            slot = self.started.index(min(self.started))
+            self.steals += 1
+        self.serial += 1
+        self.started[slot] = self.serial
+        channel = channels[slot]
+        channel.play(sound)
+        return channel
+
+    def stop(self):
+        for channel in self.channels:
+            channel.stop()
+
+
+class AudioManager:
+    """
+    Effects through per-category channel pools and one music stream. The
+    pools are set up on first use; until the mixer is running every call
+    does nothing, so the games still run without a sound device.
+    """
+    def __init__(self, pools=CHANNEL_POOLS):
+        self.pool_sizes = pools
+        self.pools = None
+        self.music_path = None
+
+    def ready(self):
+        if self.pools is None and pygame.mixer.get_init():
+            total = sum(self.pool_sizes.values())
+            pygame.mixer.set_num_channels(total + FREE_CHANNELS)
+            pygame.mixer.set_reserved(total)
+            self.pools = {}
+            first = 0
+            for category, size in self.pool_sizes.items():
+                self.pools[category] = ChannelPool([pygame.mixer.Channel(i) for i in range(first, first + size)])
+                first += size
+        return self.pools is not None
+
+    def play(self, category, sound, source=None):
+        # `sound` comes from resources.load_sound(); None (no mixer) is ignored.
+        # `source` names what made the sound (e.g. a player), for the retrigger check
+        if sound is None or not self.ready():
+            return None
+        return self.pools[category].play(sound, pygame.time.get_ticks(), source)
+
+    def stop_effects(self):
+        if self.pools is not None:
+            for pool in self.pools.values():
+                pool.stop()
+
+    def play_music(self, path, loops=-1):
+        # Keeps streaming if this track is already playing, so level restarts and menus never reload it
+        if not self.ready():
+            return
+        path = os.path.normcase(os.path.realpath(resource_path(path)))
+        if path == self.music_path and pygame.mixer.music.get_busy():
+            return
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.play(loops)
+        self.music_path = path
+
+    def stop_music(self, fade_ms=0):
+        if self.music_path is None or not pygame.mixer.get_init():
+            return
+        if fade_ms:
+            pygame.mixer.music.fadeout(fade_ms)
+        else:
+            pygame.mixer.music.stop()
+        self.music_path = None
+
+
+AUDIO = AudioManager()
+
+def play_sound(category, sound, source=None):
+    return AUDIO.play(category, sound, source)
@@ -0,0 +1,328 @@
+import os
+
+# Headless and uncapped: no window, no sound card. Must be set before pygame is imported.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from itertools import islice
+from os.path import basename, join, exists
+
+import game
+import level_format
+import level_generator
+import one_v_one
+import Space_dodger
+from render import DirtyRenderer, get_window
+from resources import resource_path
+from replay import Replay, playback
+from simulate import InputScript, ScriptedKeys
+
+FRAMES_DEFAULT = 600
+WARMUP_DEFAULT = 30
+THRESHOLD_DEFAULT = 0.15
+MIN_REGRESSION_MS = 0.05
+STRESS_LEVEL_COPIES = 40
+SCALING_SIZES = [100, 1000, 10000, 100000]
+SCALING_FORMATS = ('.json', '.lvl', '.lvls')
+
+# Run right, hop regularly and turn back now and then
+PLATFORMER_SCRIPT = """
+0 right
+20 right jump
+45 right
+70 right jump
+80 right jump
+120 left
+150 left jump
+180 right
+"""
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+# Each scenario is a generator factory: it sets a game up and yields
+# (update, draw) callables, one pair per frame.
+
+def repeat_script(script, frames, period=200):
+    # The platformer script loops so long runs keep moving
+    base = list(script.frames(period))
+    for frame in range(frames):
+        yield base[frame % period]
+
+
+def platformer_scenario(map_filename, data=None):
+    def scenario(frames):
+        window = get_window()
+        session = game.GameSession(map_filename, data=data, seed=0)
+        background = game.get_parallax_background(game.BACKGROUND_MAPPING.get(map_filename, 'Blue.png'))
+        script = InputScript.parse(PLATFORMER_SCRIPT)
+        for keys, jump in repeat_script(script, frames):
+            def update():
+                if jump:
+                    session.jump()
+                session.step(keys)
+                if session.game_over or session.level_complete:
+                    session.reset()
+
+            def draw():
+                session.draw(window, background)
+                pygame.display.update()
+            yield update, draw
+    return scenario
+
+
+def shooter_scenario(max_bullets=one_v_one.MAX_BULLET, fire_every=10, fire_rate=0, bullet_speed=one_v_one.BULLET_VEL):
+    # With fire_rate set both fire keys are also held down the whole run
+    def scenario(frames):
+        match = one_v_one.ShooterMatch(max_bullets=max_bullets, health=10 ** 9, fire_rate=fire_rate, bullet_speed=bullet_speed)
+        renderer = DirtyRenderer(get_window(), one_v_one.make_shooter_background(match.bg, one_v_one.BORDER))
+        held = [pygame.K_LCTRL, pygame.K_RCTRL] if fire_rate else []
+        for frame in range(frames):
+            up = (frame // 60) % 2 == 0
+            keys = ScriptedKeys([pygame.K_w if up else pygame.K_s, pygame.K_DOWN if up else pygame.K_UP] + held)
+            fire = frame % fire_every == 0
+
+            def update():
+                if fire:
+                    match.handle_event(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_LCTRL))
+                    match.handle_event(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RCTRL))
+                match.step(keys)
+            yield update, lambda: match.draw(renderer)
+    return scenario
+
+
+def dodger_scenario(spawn_rate=Space_dodger.SPAWN_RATE, spawn_count=1, ramp_score=None):
+    def scenario(frames):
+        dodger = Space_dodger.DodgerGame(spawn_rate=spawn_rate, spawn_count=spawn_count, ramp=ramp_score is not None, seed=0)
+        dodger.score = ramp_score or 0
+        renderer = DirtyRenderer(get_window(), dodger.bg)
+        for frame in range(frames):
+            left = (frame // 90) % 2 == 0
+            keys = ScriptedKeys([pygame.K_a if left else pygame.K_d])
+            # Hits are ignored so the run lasts the full frame count
+            yield (lambda: dodger.step(keys)), (lambda: dodger.draw(renderer))
+    return scenario
+
+
+def load_map_data(map_filename):
+    with open(resource_path(join("assets", "Maps", map_filename)), 'r') as f:
+        return json.load(f)
+
+
+def build_stress_level(copies=STRESS_LEVEL_COPIES):
+    # The six shipped maps laid end to end, repeated; only the first start point is kept
+    data = []
+    offset = 0
+    for i in range(copies):
+        level = load_map_data(f'level_data_{i % 6 + 1}.json')
+        width = max(item.get('x', 0) + item.get('width', game.EDITOR_BLOCK_SIZE) for item in level)
+        for item in level:
+            if item.get('name') == 'start_point' and i > 0:
+                continue
+            item = dict(item)
+            item['x'] = item.get('x', 0) + offset
+            data.append(item)
+        offset += width + game.EDITOR_BLOCK_SIZE
+    return data
+
+
+def streamed_stress_scenario(frames):
+    # The stress level written as a chunked file, so only chunks near the camera are built
+    path = join(tempfile.mkdtemp(), 'stress.lvls')
+    level_format.write_chunked(path, build_stress_level())
+    yield from platformer_scenario(path)(frames)
+
+
+def replay_scenario(path):
+    # A recorded session (see replay.py), played through once; runs no longer than the recording
+    def scenario(frames):
+        return islice(playback(Replay.load(path)), frames)
+    return scenario
+
+
+def build_scenarios(replays=()):
+    scenarios = {}
+    for i in range(1, 7):
+        name = f'level_data_{i}.json'
+        scenarios[f'platformer:{name}'] = platformer_scenario(name)
+    scenarios['platformer:stress_huge_level'] = lambda frames: platformer_scenario('level_data_1.json', build_stress_level())(frames)
+    scenarios['platformer:stress_streamed_level'] = streamed_stress_scenario
+    scenarios['shooter'] = shooter_scenario()
+    scenarios['shooter:stress_full_magazines'] = shooter_scenario(max_bullets=500, fire_every=1)
+    scenarios['shooter:stress_bullet_hell'] = shooter_scenario(max_bullets=1000, fire_every=1000, fire_rate=1, bullet_speed=3)
+    scenarios['dodger'] = dodger_scenario()
+    scenarios['dodger:stress_obstacles'] = dodger_scenario(spawn_rate=1, spawn_count=25)
+    scenarios['dodger:stress_full_ramp'] = dodger_scenario(ramp_score=Space_dodger.RAMP_SCORE)
+    for path in replays:
+        scenarios[f'replay:{basename(path)}'] = replay_scenario(path)
+    return scenarios
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples_ns):
+    values = sorted(v / 1e6 for v in samples_ns)
+    return {
+        'mean': round(sum(values) / len(values), 4) if values else 0.0,
+        'p50': round(percentile(values, 50), 4),
+        'p95': round(percentile(values, 95), 4),
+        'p99': round(percentile(values, 99), 4),
+        'max': round(values[-1], 4) if values else 0.0,
+    }
+
+
+def run_scenario(scenario, frames, warmup):
+    update_ns, draw_ns, frame_ns = [], [], []
+    setup_start = time.perf_counter()
+    for i, (update, draw) in enumerate(scenario(frames + warmup)):
+        t0 = time.perf_counter_ns()
+        update()
+        t1 = time.perf_counter_ns()
+        draw()
+        t2 = time.perf_counter_ns()
+        if i >= warmup:
+            update_ns.append(t1 - t0)
+            draw_ns.append(t2 - t1)
+            frame_ns.append(t2 - t0)
+    return {
+        'frames': len(frame_ns),
+        'seconds': round(time.perf_counter() - setup_start, 3),
+        'update_ms': summarize(update_ns),
+        'draw_ms': summarize(draw_ns),
+        'frame_ms': summarize(frame_ns),
+    }
+
+
+def run_meta(frames, warmup):
+    return {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'frames': frames,
+        'warmup': warmup,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_benchmarks(frames=FRAMES_DEFAULT, warmup=WARMUP_DEFAULT, only=None, replays=()):
+    get_window()
+    results = {}
+    for name, scenario in build_scenarios(replays).items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = run_scenario(scenario, frames, warmup)
+        frame = results[name]['frame_ms']
+        print(f"{name:36} p50 {frame['p50']:8.3f} ms  p95 {frame['p95']:8.3f} ms  p99 {frame['p99']:8.3f} ms  max {frame['max']:8.3f} ms", file=sys.stderr)
+    return {'meta': run_meta(frames, warmup), 'scenarios': results}
+
+
+def run_scaling(sizes=SCALING_SIZES, frames=FRAMES_DEFAULT, warmup=WARMUP_DEFAULT, seed=0):
+    """
+    Load time and frame time against object count, on generated levels (see
+    level_generator) written in every level format. Load time is building a
+    GameSession from the file, which for a chunked level includes streaming in
+    the chunks around the start.
+    """
+    get_window()
+    # Decode the shared sprites first so the smallest level is not charged for them
+    game.GameSession('warmup', data=level_generator.generate_level(100, seed))
+    folder = tempfile.mkdtemp()
+    rows = []
+    for count in sizes:
+        data = level_generator.generate_level(count, seed)
+        row = {'objects': len(data), 'load_ms': {}, 'file_bytes': {}, 'frame_ms': {}}
+        for ext in SCALING_FORMATS:
+            path = level_generator.write_level(join(folder, f'generated_{count}{ext}'), data)
+            start = time.perf_counter()
+            game.GameSession(path)
+            row['load_ms'][ext] = round((time.perf_counter() - start) * 1000, 3)
+            row['file_bytes'][ext] = os.path.getsize(path)
+        # Every format but the chunked one builds the same Level, so one run covers them
+        for ext in ('.json', '.lvls'):
+            path = join(folder, f'generated_{count}{ext}')
+            row['frame_ms'][ext] = run_scenario(platformer_scenario(path), frames, warmup)['frame_ms']
+        rows.append(row)
+
+        loads = '  '.join(f"{ext} {ms:9.1f}" for ext, ms in row['load_ms'].items())
+        frame = '  '.join(f"{ext} {ms['p50']:7.3f}/{ms['p99']:7.3f}" for ext, ms in row['frame_ms'].items())
+        print(f"{len(data):7} objects  load ms {loads}  frame ms p50/p99 {frame}", file=sys.stderr)
+    return {'meta': dict(run_meta(frames, warmup), seed=seed), 'scaling': rows}
+
+# -----------------------------
+# Comparison
+# -----------------------------
+def compare(current, baseline, threshold=THRESHOLD_DEFAULT):
+    # Returns (scenario, metric, baseline ms, current ms) for every metric that got slower than allowed
+    regressions = []
+    for name, result in current['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        for phase in ('frame_ms', 'update_ms', 'draw_ms'):
+            for metric in ('p50', 'p95', 'p99'):
+                old = base[phase][metric]
+                new = result[phase][metric]
+                if new > old * (1 + threshold) and new - old > MIN_REGRESSION_MS:
+                    regressions.append((name, f'{phase}.{metric}', old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless frame-time benchmarks for the Shooter, Dodger and Platformer.")
+    parser.add_argument('--frames', type=int, default=FRAMES_DEFAULT)
+    parser.add_argument('--warmup', type=int, default=WARMUP_DEFAULT)
+    parser.add_argument('--only', nargs='*', help="run only scenarios whose name contains one of these")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="baseline results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD_DEFAULT, help="allowed slowdown, e.g. 0.15 for 15%%")
+    parser.add_argument('--scaling', type=int, nargs='*', metavar='COUNT',
+                        help=f"instead of the scenarios, time loading and playing generated levels of these sizes (default {SCALING_SIZES})")
+    parser.add_argument('--seed', type=int, default=0, help="level generator seed for --scaling")
+    parser.add_argument('--replay', nargs='+', default=[], metavar='FILE', help="also run these recorded sessions as scenarios")
+    args = parser.parse_args(argv)
+    if args.scaling is not None and args.compare:
+        parser.error("--compare works on scenario results, not --scaling")
+
+    # Read before anything is written, so --compare can name the --output file of the last run
+    baseline = None
+    if args.compare:
+        if not exists(args.compare):
+            print(f"No baseline at {args.compare}", file=sys.stderr)
+            return 2
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+
+    if args.scaling is not None:
+        results = run_scaling(args.scaling or SCALING_SIZES, args.frames, args.warmup, args.seed)
+    else:
+        results = run_benchmarks(args.frames, args.warmup, args.only, args.replay)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old:.3f} ms -> {new:.3f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
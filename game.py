@@ -1,36 +1,30 @@
 import pygame
-import os
 import math
-import sys
 import json
 import random
+import time
+from array import array
 from os import listdir
-from os.path import isfile, join, exists
+from os.path import isfile, join
 
-pygame.init()
-pygame.mixer.init()
-pygame.font.init()
-
-# -----------------------------
-# Resource path helper
-# -----------------------------
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and PyInstaller """
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+from resources import resource_path, IMAGE_CACHE, PREFETCHER, load_font, render_text
+from render import DirtyRenderer, RENDER_FPS, VSYNC, get_window
+from profiler import FrameProfiler
+from audio import AUDIO
+from replay import start_recording, finish_recording, new_seed
+from level_format import read_level, find_level_file, is_chunked_level, ChunkedLevelFile
 
 # -----------------------------
 # Game constants
 # -----------------------------
 WIDTH, HEIGHT = 900, 500
-window = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Platformer")
 
 FPS = 60
+# The simulation advances in fixed steps of 1/FPS whatever the render rate is.
+SIM_DT = 1.0 / FPS
+MAX_STEPS_PER_FRAME = 5     # below FPS/5 rendered frames per second the game slows down instead of spiralling
+MAX_FRAME_TIME = 0.25
+DT_SNAP = 0.0005            # frame times this close to a whole number of steps count as exactly that
 PLAYER_VEL = 8
 BASE_TILE_SIZE = 32
 EDITOR_BLOCK_SIZE = 96
@@ -46,10 +40,10 @@ TIME_FOR_1_STARS = 180.0
 # Assets
 # -----------------------------
 LEVEL_COMPLETE_ASSETS = {
-    3: resource_path(join("assets", "other", "level_complete_3.png")),
-    2: resource_path(join("assets", "other", "level_complete_2.png")),
-    1: resource_path(join("assets", "other", "level_complete_1.png")),
-    0: resource_path(join("assets", "other", "level_complete_0.png")),
+    3: resource_path(join("assets", "Other", "level_complete_3.png")),
+    2: resource_path(join("assets", "Other", "level_complete_2.png")),
+    1: resource_path(join("assets", "Other", "level_complete_1.png")),
+    0: resource_path(join("assets", "Other", "level_complete_0.png")),
 }
 
 BACKGROUND_MAPPING = {
@@ -79,17 +73,17 @@ MAP_FILES = {
 # -----------------------------
 # Fonts
 # -----------------------------
-def try_font(path, size):
-    return pygame.font.Font(resource_path(path), size)
+FONT_PATH = join("assets", "Menu", "Text", "Platform.TTF")
 
-FONT = try_font(join("assets", "Menu", "Text", "Platform.TTF"), 40)
-MENU_FONT = try_font(join("assets", "Menu", "Text", "Platform.TTF"), 80)
+def try_font(path, size):
+    return load_font(path, size)
 
 # -----------------------------
 # Utilities
 # -----------------------------
-def load_image(path, fallback_size=(32, 32)):
-    return pygame.image.load(resource_path(path)).convert_alpha()
+def load_image(path, fallback_size=(32, 32), mode='alpha'):
+    # Decoded once per process through the shared cache; never mutate the result in place
+    return IMAGE_CACHE.load(path, mode)
 
 def load_sprite_sheets(dir1, dir2, width, height, direction=False):
     path = resource_path(join("assets", dir1, dir2))
@@ -132,59 +126,148 @@ def cut_spritesheet(sheet, fw, fh, count=None):
         frames.append(sheet.subsurface(rect).copy())
     return frames
 
+def build_masks(frames):
+    # Collision masks are built once per animation frame, right after the frames are cut
+    return [pygame.mask.from_surface(f) for f in frames]
+
+_animation_frames = {}
+
+def get_animation_frames(sheet_path, frame_size, size):
+    # Scaled frames and their masks, shared by every object using the same sheet at the same size
+    key = (sheet_path, frame_size, size)
+    cached = _animation_frames.get(key)
+    if cached is None:
+        sheet = load_image(resource_path(sheet_path), frame_size)
+        fw, fh = frame_size
+        frames = []
+        if sheet and fw > 0:
+            for i in range(sheet.get_width() // fw):
+                fr = pygame.Surface((fw, fh), pygame.SRCALPHA)
+                fr.blit(sheet, (0, 0), (i * fw, 0, fw, fh))
+                frames.append(pygame.transform.scale(fr, size))
+        cached = _animation_frames[key] = (frames, build_masks(frames))
+    return cached
+
 def get_background(name):
     path = resource_path(join("assets", "Background", name))
-    img = load_image(path).convert()
+    img = load_image(path, mode='opaque')
     return img, img.get_width(), img.get_height()
 
+class ParallaxLayer:
+    """ A background tile pre-composed once into a strip one tile larger than the view """
+    def __init__(self, image, parallax=0.5, view_size=(WIDTH, HEIGHT)):
+        self.parallax = parallax
+        self.tile_w, self.tile_h = image.get_size()
+        self.view_w, self.view_h = view_size
+        self.strip = pygame.Surface((self.view_w + self.tile_w, self.view_h + self.tile_h)).convert()
+        for x in range(0, self.strip.get_width(), self.tile_w):
+            for y in range(0, self.strip.get_height(), self.tile_h):
+                self.strip.blit(image, (x, y))
+
+    def draw(self, win, ox, oy):
+        # The strip repeats every tile, so any offset maps to one window into it
+        sx = int(ox * self.parallax) % self.tile_w
+        sy = int(oy * self.parallax) % self.tile_h
+        win.blit(self.strip, (0, 0), (sx, sy, self.view_w, self.view_h))
+
+class Background:
+    def __init__(self, layers):
+        self.layers = layers
+
+    def draw(self, win, ox, oy):
+        for layer in self.layers:
+            layer.draw(win, ox, oy)
+
+def get_parallax_background(name, parallax=0.5):
+    img, _, _ = get_background(name)
+    return Background([ParallaxLayer(img, parallax)])
+
+# -----------------------------
+# Tile atlas
+# -----------------------------
+class TileAtlas:
+    """ Slices a tile sheet once per (sx, sy, size) and shares the scaled tile and its mask """
+    def __init__(self, path, tile_size):
+        self.path = path
+        self.tile_size = tile_size
+        self.tiles = {}
+
+    def get(self, size, sx, sy):
+        key = (sx, sy, size)
+        tile = self.tiles.get(key)
+        if tile is None:
+            sheet = load_image(self.path)
+            surf = pygame.Surface((self.tile_size, self.tile_size), pygame.SRCALPHA)
+            surf.blit(sheet, (0, 0), pygame.Rect(sx, sy, self.tile_size, self.tile_size))
+            image = pygame.transform.scale(surf, (size, size)).convert_alpha()
+            tile = self.tiles[key] = (image, pygame.mask.from_surface(image))
+        return tile
+
+    def build(self, sizes, variants):
+        for size in sizes:
+            for sx, sy in variants:
+                self.get(size, sx, sy)
+
+
+TERRAIN_ATLAS = TileAtlas(join("assets", "Terrain", "Terrain.png"), BASE_TILE_SIZE)
+SPECIAL_ATLAS = TileAtlas(join("assets", "Traps", "Climate", "Special.png"), 48)
+
+def build_tile_atlases():
+    # Every terrain variant used by the shipped maps, at block and tiny block size
+    TERRAIN_ATLAS.build((EDITOR_BLOCK_SIZE, 48), [(96, y) for y in (0, 64, 128)] + [(144, y) for y in (0, 64, 128)])
+    SPECIAL_ATLAS.build((EDITOR_BLOCK_SIZE,), [(0, 0), (64, 0), (128, 0)])
+
 def get_block_variant(size, sx, sy):
-    path = resource_path(join("assets", "Terrain", "Terrain.png"))
-    img = load_image(path, (BASE_TILE_SIZE, BASE_TILE_SIZE))
-    surf = pygame.Surface((BASE_TILE_SIZE, BASE_TILE_SIZE), pygame.SRCALPHA)
-    surf.blit(img, (0, 0), pygame.Rect(sx, sy, BASE_TILE_SIZE, BASE_TILE_SIZE))
-    return pygame.transform.scale(surf, (size, size))
+    return TERRAIN_ATLAS.get(size, sx, sy)[0]
 
 def get_special_block_variant(size, sx, sy):
-    path = resource_path(join("assets", "Traps", "Climate", "Special.png"))
-    TILE_SIZE = 48
-    img = load_image(path, (TILE_SIZE, TILE_SIZE))
-    surf = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
-    surf.blit(img, (0, 0), pygame.Rect(sx, sy, TILE_SIZE, TILE_SIZE))
-    return pygame.transform.scale(surf, (size, size))
+    return SPECIAL_ATLAS.get(size, sx, sy)[0]
 
 # Base object classes
 class BaseObject(pygame.sprite.Sprite):
-    def __init__(self, x, y, w, h, name=None):
+    def __init__(self, x, y, w, h, name=None, image=None, mask=None):
         super().__init__()
         self.rect = pygame.Rect(x, y, w, h)
-        self.image = pygame.Surface((w, h), pygame.SRCALPHA)
+        self.image = image if image is not None else pygame.Surface((w, h), pygame.SRCALPHA)
         self.width = w
         self.height = h
         self.name = name
-        self.mask = pygame.mask.from_surface(self.image)
+        self.mask = mask if mask is not None else pygame.mask.from_surface(self.image)
+
+    anim_tick = 0
+    # Attributes that change during play; everything else is fixed once the level is loaded
+    STATE = ('anim_tick',)
 
     def draw(self, win, ox, oy):
         win.blit(self.image, (self.rect.x - ox, self.rect.y - oy))
 
+    def save_state(self):
+        return tuple(getattr(self, name) for name in self.STATE)
+
+    def load_state(self, state):
+        for name, value in zip(self.STATE, state):
+            setattr(self, name, value)
+
     def loop(self):
         return
 
+    def animate(self, tick):
+        # Called only while near the camera; subclasses catch up on the ticks they missed
+        return
+
 class Block(BaseObject):
     def __init__(self, x, y, size, vx=96, vy=0):
-        super().__init__(x, y, size, size, name='block')
+        # Image and mask are shared with every other block of this variant
+        image, mask = TERRAIN_ATLAS.get(size, vx, vy)
+        super().__init__(x, y, size, size, 'block', image, mask)
         self.variant_x = vx
         self.variant_y = vy
-        self.image = get_block_variant(size, vx, vy)
-        self.rect = self.image.get_rect(topleft=(x, y))
-        self.mask = pygame.mask.from_surface(self.image)
         if size == 48:
             self.name = 'tiny_block'
 
 class SpecialBlock(BaseObject):
     def __init__(self, x, y, name, size=EDITOR_BLOCK_SIZE, vx=0, vy=0):
-        super().__init__(x, y, size, size, name)
-        self.variant_x = vx
-        self.variant_y = vy
+        variant_x, variant_y = vx, vy
 
         if name == "mud":
             vx = 0
@@ -193,35 +276,38 @@ class SpecialBlock(BaseObject):
         elif name == "ice":
             vx = 128
 
-        self.image = get_special_block_variant(size, vx, vy)
-        self.rect = self.image.get_rect(topleft=(x, y))
-        self.mask = pygame.mask.from_surface(self.image)
+        image, mask = SPECIAL_ATLAS.get(size, vx, vy)
+        super().__init__(x, y, size, size, name, image, mask)
+        self.variant_x = variant_x
+        self.variant_y = variant_y
 
 class AnimatedObject(BaseObject):
+    STATE = ('anim_tick', 'anim_count', 'image', 'mask')
+
     def __init__(self, x, y, w, h, name, sheet_path, frame_size, anim_delay=5):
-        super().__init__(x, y, w, h, name=name)
-        sheet = load_image(resource_path(sheet_path), (frame_size[0], frame_size[1]))
-        fw, fh = frame_size
-        self.frames = []
-        if sheet and fw > 0:
-            for i in range(sheet.get_width() // fw):
-                fr = pygame.Surface((fw, fh), pygame.SRCALPHA)
-                fr.blit(sheet, (0, 0), (i * fw, 0, fw, fh))
-                self.frames.append(pygame.transform.scale(fr, (w, h)))
+        self.frames, self.masks = get_animation_frames(sheet_path, tuple(frame_size), (w, h))
+        if self.frames:
+            super().__init__(x, y, w, h, name, self.frames[0], self.masks[0])
+        else:
+            super().__init__(x, y, w, h, name=name)
         self.anim_delay = anim_delay
         self.anim_count = 0
-        if self.frames:
-            self.image = self.frames[0]
-            self.mask = pygame.mask.from_surface(self.image)
 
     def loop(self):
         if not getattr(self, 'frames', None):
             return
         idx = (self.anim_count // self.anim_delay) % len(self.frames)
         self.image = self.frames[idx]
-        self.mask = pygame.mask.from_surface(self.image)
+        self.mask = self.masks[idx]
         self.anim_count += 1
 
+    def animate(self, tick):
+        missed = tick - self.anim_tick - 1
+        self.anim_tick = tick
+        if missed > 0:
+            self.anim_count += missed
+        self.loop()
+
 class SpikeHead(AnimatedObject):
     def __init__(self, x, y, w, h):
         super().__init__(x, y, w, h, 'spike_head', join(resource_path('assets'), 'Traps', 'Spike Head', 'Blink.png'), (54, 52), anim_delay=6)
@@ -232,7 +318,7 @@ class Fire(AnimatedObject):
 
 class Saw(AnimatedObject):
     def __init__(self, x, y, w, h):
-        super().__init__(x, y, w, h, 'saw', join(resource_path('assets'), 'Traps', 'saw', 'on.png'), (38, 38), anim_delay=2)
+        super().__init__(x, y, w, h, 'saw', join(resource_path('assets'), 'Traps', 'Saw', 'on.png'), (38, 38), anim_delay=2)
 
 class CheckPoint(AnimatedObject):
     def __init__(self, x, y, size):
@@ -249,50 +335,144 @@ class EndPoint(AnimatedObject):
         super().__init__(x, y, size, size, 'end_point',
                          join(resource_path('assets'), 'Items', 'Checkpoints', 'End', 'end.png'), (64, 64), anim_delay=6)
 
-class Particle(BaseObject):
-    def __init__(self, x, y, image_path, velocity=(0,0), lifetime = 20):
-        super().__init__(x, y, 10, 19, name='particle')
-
-        img = load_image(resource_path(image_path), (5, 5))
-        self.image = pygame.transform.scale(img, (10, 10))
-
-        self.rect = self.image.get_rect(center=(x, y))
-        self.x_vel, self.y_vel = velocity
-        self.lifetime = lifetime
-        self.current_age = 0
-        
-        angle = pygame.time.get_ticks() % 360
-        self.image = pygame.transform.rotate(self.image, angle)
+# -----------------------------
+# Particles
+# -----------------------------
+class ParticleSystem:
+    """ Particle state lives in flat arrays; dead slots are filled by swapping in the last live one """
+    GRAVITY = 0.5
+    SIZE = 10
+    ANGLE_STEPS = 8
+    FADE_STEPS = 16
+    KINDS = list(PARTICLE_MAPPING)
+
+    _frames = {}
+
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self.count = 0
+        self.x = array('f', bytes(4 * capacity))
+        self.y = array('f', bytes(4 * capacity))
+        self.vx = array('f', bytes(4 * capacity))
+        self.vy = array('f', bytes(4 * capacity))
+        self.age = array('H', bytes(2 * capacity))
+        self.lifetime = array('H', bytes(2 * capacity))
+        self.kind = array('B', bytes(capacity))
+        self.angle = array('B', bytes(capacity))
+
+    @classmethod
+    def frames_for(cls, kind):
+        # [angle][fade] table of pre-rotated, pre-faded surfaces with their half sizes
+        table = cls._frames.get(kind)
+        if table is None:
+            base = pygame.transform.scale(load_image(PARTICLE_MAPPING[kind]), (cls.SIZE, cls.SIZE))
+            table = []
+            for a in range(cls.ANGLE_STEPS):
+                rotated = pygame.transform.rotate(base, a * 360 / cls.ANGLE_STEPS)
+                fades = []
+                for f in range(cls.FADE_STEPS):
+                    frame = rotated.copy()
+                    frame.set_alpha(255 - 255 * f // cls.FADE_STEPS)
+                    fades.append((frame, frame.get_width() / 2, frame.get_height() / 2))
+                table.append(fades)
+            cls._frames[kind] = table
+        return table
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self, x, y, vx, vy, lifetime, kind='regular', rng=random):
+        if self.count >= self.capacity:
+            return
+        if kind not in PARTICLE_MAPPING:
+            kind = 'regular'
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.age[i] = 0
+        self.lifetime[i] = lifetime
+        self.kind[i] = self.KINDS.index(kind)
+        self.angle[i] = rng.randrange(self.ANGLE_STEPS)
+        self.count += 1
 
     def update(self):
-        self.rect.x += self.x_vel
-        self.rect.y += self.y_vel
-
-        self.y_vel += 0.5
+        """
+        Steps every live particle in one Python loop, about 0.5 us per
+        particle (8192, the full capacity, takes ~4.3 ms), so roughly 2000
+        fit in 1 ms of the 16.7 ms step. Play keeps under 20 alive (two
+        every third running step, 25 steps at most). Whole-slice passes with map()
+        and compress() measured no faster: boxing each float costs the same
+        either way, and only numpy would batch it, which the build leaves
+        out. Spawn well past ~2000 and this loop becomes the step's cost.
+        """
+        x, y, vx, vy = self.x, self.y, self.vx, self.vy
+        age, lifetime = self.age, self.lifetime
+        gravity = self.GRAVITY
+        i = 0
+        n = self.count
+        while i < n:
+            x[i] += vx[i]
+            y[i] += vy[i]
+            vy[i] += gravity
+            age[i] += 1
+            if age[i] > lifetime[i]:
+                n -= 1
+                self._move(n, i)
+                continue
+            i += 1
+        self.count = n
+
+    def _move(self, src, dst):
+        for buf in (self.x, self.y, self.vx, self.vy, self.age, self.lifetime, self.kind, self.angle):
+            buf[dst] = buf[src]
 
-        self.current_age += 1
-        alpha = 255 - int(255 * (self.current_age / self.lifetime))
-        self.image.set_alpha(max(0, alpha))
-        
-        if self.current_age > self.lifetime:
-            self.kill()
+    def draw(self, win, ox, oy):
+        if not self.count:
+            return
+        tables = [self.frames_for(k) for k in self.KINDS]
+        steps = self.FADE_STEPS
+        batch = []
+        for i in range(self.count):
+            fade = min(steps - 1, self.age[i] * steps // self.lifetime[i])
+            frame, hw, hh = tables[self.kind[i]][self.angle[i]][fade]
+            batch.append((frame, (self.x[i] - hw - ox, self.y[i] - hh - oy)))
+        win.blits(batch, False)
 
 class Trampoline(BaseObject):
     WIDTH = EDITOR_BLOCK_SIZE
     HEIGHT = int(EDITOR_BLOCK_SIZE * 0.35)
     BOUNCE_VELOCITY = -44  # Trampoline jump height
     ANIM_DELAY = 4
-
-    _idle = pygame.transform.scale(load_image(resource_path("assets/Traps/Trampoline/Idle.png")), (WIDTH, HEIGHT))
-    _jump_frames = [pygame.transform.scale(f, (WIDTH, HEIGHT)) for f in cut_spritesheet(load_image(resource_path("assets/Traps/Trampoline/Jump.png")), 282, 28, count=8)]
+    STATE = ('anim_tick', 'anim_idx', 'anim_count', 'animating', 'image', 'mask')
+
+    # Shared by every trampoline; decoded by the first one built
+    _idle = None
+    _jump_frames = None
+    _idle_mask = None
+    _jump_masks = None
+
+    @classmethod
+    def load_frames(cls):
+        size = (cls.WIDTH, cls.HEIGHT)
+        cls._idle = pygame.transform.scale(load_image(resource_path("assets/Traps/Trampoline/Idle.png")), size)
+        cls._jump_frames = [pygame.transform.scale(f, size) for f in cut_spritesheet(load_image(resource_path("assets/Traps/Trampoline/Jump.png")), 282, 28, count=8)]
+        cls._idle_mask = pygame.mask.from_surface(cls._idle)
+        cls._jump_masks = build_masks(cls._jump_frames)
 
     def __init__(self, x, y):
-        super().__init__(x, y, Trampoline.WIDTH, Trampoline.HEIGHT, name='trampoline')
+        if Trampoline._idle is None:
+            Trampoline.load_frames()
+        super().__init__(x, y, Trampoline.WIDTH, Trampoline.HEIGHT, 'trampoline', Trampoline._idle, Trampoline._idle_mask)
         self.idle = Trampoline._idle
+        self.idle_mask = Trampoline._idle_mask
         self.frames = Trampoline._jump_frames or [self.idle]
-        self.image = self.idle
+        self.masks = Trampoline._jump_masks or [self.idle_mask]
         self.rect = self.image.get_rect(topleft=(x, y))
-        self.mask = pygame.mask.from_surface(self.image)
         self.anim_idx = 0
         self.anim_count = 0
         self.animating = False
@@ -300,6 +480,7 @@ class Trampoline(BaseObject):
     def loop(self):
         if not self.animating:
             self.image = self.idle
+            self.mask = self.idle_mask
             return
         self.anim_count += 1
         if self.anim_count % Trampoline.ANIM_DELAY == 0:
@@ -308,9 +489,20 @@ class Trampoline(BaseObject):
                 self.anim_idx = 0
                 self.animating = False
                 self.image = self.idle
+                self.mask = self.idle_mask
             else:
                 self.image = self.frames[self.anim_idx]
-        self.mask = pygame.mask.from_surface(self.image)
+                self.mask = self.masks[self.anim_idx]
+
+    def animate(self, tick):
+        steps = tick - self.anim_tick
+        self.anim_tick = tick
+        if not self.animating:
+            self.loop()
+            return
+        # A bounce finishes within len(frames) * ANIM_DELAY steps; anything past that is idle
+        for _ in range(min(steps, len(self.frames) * Trampoline.ANIM_DELAY)):
+            self.loop()
 
     def bounce(self, player):
         player.y_vel = Trampoline.BOUNCE_VELOCITY
@@ -321,11 +513,19 @@ class Trampoline(BaseObject):
 # Player class
 class Player(pygame.sprite.Sprite):
     GRAVITY = 1
-    SPRITES = load_sprite_sheets('MainCharacters', 'MaskDude', 32, 32, True)
+    SPRITES = None  # decoded by the first Player built
+    MASKS = None
     ANIM_DELAY = 3
 
+    @classmethod
+    def load_sprites(cls):
+        cls.SPRITES = load_sprite_sheets('MainCharacters', 'MaskDude', 32, 32, True)
+        cls.MASKS = {key: build_masks(frames) for key, frames in cls.SPRITES.items()}
+
     def __init__(self, x, y, w, h):
         super().__init__()
+        if Player.SPRITES is None:
+            Player.load_sprites()
         self.rect = pygame.Rect(x, y, w, h)
         self.x_vel = 0
         self.y_vel = 0
@@ -338,6 +538,7 @@ class Player(pygame.sprite.Sprite):
         self.lives_invincibility_timer = 0
         self.start_pos = (x, y)
         self.sprite = self.SPRITES.get('idle_right', [pygame.Surface((w, h), pygame.SRCALPHA)])[0]
+        self.sprite_mask = self.MASKS['idle_right'][0] if 'idle_right' in self.MASKS else pygame.mask.from_surface(self.sprite)
         self.update()
 
         self.terrain_modifier = 1.0
@@ -430,9 +631,12 @@ class Player(pygame.sprite.Sprite):
         elif self.x_vel != 0:
             sheet = 'run'
         key = sheet + '_' + self.direction
-        sprites = self.SPRITES.get(key, self.SPRITES.get('idle_' + self.direction, [pygame.Surface((self.rect.w, self.rect.h), pygame.SRCALPHA)]))
+        if key not in self.SPRITES:
+            key = 'idle_' + self.direction
+        sprites = self.SPRITES.get(key, [pygame.Surface((self.rect.w, self.rect.h), pygame.SRCALPHA)])
         idx = (self.animation_count // self.ANIM_DELAY) % len(sprites)
         self.sprite = sprites[idx]
+        self.sprite_mask = self.MASKS[key][idx] if key in self.MASKS else pygame.mask.from_surface(self.sprite)
         self.animation_count += 1
         if self.lives_invincibility_timer > 0 and (self.lives_invincibility_timer // 6) % 2 == 0:
             self.sprite.set_alpha(100)
@@ -442,7 +646,7 @@ class Player(pygame.sprite.Sprite):
 
     def update(self):
         self.rect = self.sprite.get_rect(topleft=(self.rect.x, self.rect.y))
-        self.mask = pygame.mask.from_surface(self.sprite)
+        self.mask = self.sprite_mask
 
     def draw(self, win, ox, oy, inv):
         win.blit(self.sprite, (self.rect.x - ox, self.rect.y - oy))
@@ -452,32 +656,44 @@ class Fruit(BaseObject):
     FRUIT_SIZE = 48
     ANIM_DELAY = 6
     FRAME_SIZE = 32
-
-    MELON = load_image(resource_path(join("assets", "Items", "Fruits", "Melon.png")))
-    PINEAPPLE = load_image(resource_path(join("assets", "Items", "Fruits", "Pineapple.png")))
-    STRAWBERRY = load_image(resource_path(join("assets", "Items", "Fruits", "Strawberry.png")))
+    STATE = ('anim_tick', 'animation_count', 'image', 'mask')
 
     FRUIT_ASSETS = {
-        "melon": (MELON, (FRAME_SIZE, FRAME_SIZE)),
-        "pineapple": (PINEAPPLE, (FRAME_SIZE, FRAME_SIZE)),
-        "strawberry": (STRAWBERRY, (FRAME_SIZE, FRAME_SIZE)),
+        "melon": (join("assets", "Items", "Fruits", "Melon.png"), (FRAME_SIZE, FRAME_SIZE)),
+        "pineapple": (join("assets", "Items", "Fruits", "Pineapple.png"), (FRAME_SIZE, FRAME_SIZE)),
+        "strawberry": (join("assets", "Items", "Fruits", "Strawberry.png"), (FRAME_SIZE, FRAME_SIZE)),
     }
 
-    def __init__(self, x, y, name):
-        super().__init__(x, y, self.FRUIT_SIZE, self.FRUIT_SIZE, name)
+    _frames = {}
 
-        sheet, (fw, fh) = self.FRUIT_ASSETS[name]
-
-        self.frames = []
-        for i in range(sheet.get_width() // fw):
-            frame = pygame.Surface((fw, fh), pygame.SRCALPHA)
-            frame.blit(sheet, (0,0), (i * fw, 0, fw, fh))
-            self.frames.append(pygame.transform.scale(frame, (self.FRUIT_SIZE, self.FRUIT_SIZE)))
+    def __init__(self, x, y, name):
+        if name not in Fruit._frames:
+            path, (fw, fh) = self.FRUIT_ASSETS[name]
+            sheet = load_image(resource_path(path))
+            frames = []
+            for i in range(sheet.get_width() // fw):
+                frame = pygame.Surface((fw, fh), pygame.SRCALPHA)
+                frame.blit(sheet, (0,0), (i * fw, 0, fw, fh))
+                frames.append(pygame.transform.scale(frame, (self.FRUIT_SIZE, self.FRUIT_SIZE)))
+            Fruit._frames[name] = (frames, build_masks(frames))
+        self.frames, self.masks = Fruit._frames[name]
 
+        super().__init__(x, y, self.FRUIT_SIZE, self.FRUIT_SIZE, name, self.frames[0], self.masks[0])
         self.animation_count = 0
-        self.mask = pygame.mask.from_surface(self.image)
         self.anim_delay = self.ANIM_DELAY
-        self.image = self.frames[0]
+
+    def loop(self):
+        idx = (self.animation_count // self.anim_delay) % len(self.frames)
+        self.image = self.frames[idx]
+        self.mask = self.masks[idx]
+        self.animation_count += 1
+
+    def animate(self, tick):
+        missed = tick - self.anim_tick - 1
+        self.anim_tick = tick
+        if missed > 0:
+            self.animation_count += missed
+        self.loop()
 
 
 class Button:
@@ -501,6 +717,359 @@ class GameButton(Button):
         return self.rect.collidepoint(pos)
     
 
+# -----------------------------
+# Spatial index
+# -----------------------------
+GRID_CELL_SIZE = EDITOR_BLOCK_SIZE * 2
+CULL_MARGIN = EDITOR_BLOCK_SIZE * 2
+CHUNK_SIZE = 512
+STATIC_MAX_CHUNKS = 64      # baked static chunks kept at once, 1 MB each
+
+def grid_cells(rect, cell_size):
+    # (column, row) of every cell of size `cell_size` that `rect` touches
+    for cx in range(rect.left // cell_size, (rect.right - 1) // cell_size + 1):
+        for cy in range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1):
+            yield cx, cy
+
+class SpatialGrid:
+    """ Uniform grid over level objects; rect queries only look at the cells the rect touches """
+    def __init__(self, objects=(), cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.order = {}
+        self._next = 0
+        for obj in objects:
+            self.insert(obj)
+
+    def __len__(self):
+        return len(self.order)
+
+    def _cells(self, rect):
+        return grid_cells(rect, self.cell_size)
+
+    def insert(self, obj, order=None):
+        # `order` puts a removed object back at its original place in level order
+        if order is None:
+            order = self._next
+            self._next += 1
+        self.order[obj] = order
+        for cell in self._cells(obj.rect):
+            self.cells.setdefault(cell, []).append(obj)
+
+    def remove(self, obj):
+        # Returns the object's place in level order, or None if it was not in the grid
+        order = self.order.pop(obj, None)
+        if order is None:
+            return None
+        for cell in self._cells(obj.rect):
+            bucket = self.cells.get(cell)
+            if bucket and obj in bucket:
+                bucket.remove(obj)
+                if not bucket:
+                    del self.cells[cell]
+        return order
+
+    def query(self, rect, after=None):
+        # Objects whose rect overlaps `rect`, in level order (only those placed after `after` if given)
+        first = self.order[after] + 1 if after is not None else 0
+        found = set()
+        for cell in self._cells(rect):
+            for obj in self.cells.get(cell, ()):
+                if self.order[obj] >= first and obj.rect.colliderect(rect):
+                    found.add(obj)
+        if len(found) < 2:
+            return list(found)
+        return sorted(found, key=self.order.__getitem__)
+
+
+class StaticLayer:
+    """
+    Non-moving level geometry pre-rendered into fixed-size chunk surfaces.
+    Chunks are baked at load time while they fit in max_chunks; past that
+    (very large levels) they are baked when first drawn and the least
+    recently drawn ones are dropped.
+    """
+    def __init__(self, objects=(), chunk_size=CHUNK_SIZE, max_chunks=STATIC_MAX_CHUNKS):
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.chunks = {}    # baked surfaces, least recently drawn first
+        self.cell_objects = {}
+        self.add(objects)
+
+    def add(self, objects):
+        touched = set()
+        for obj in objects:
+            for cell in grid_cells(obj.rect, self.chunk_size):
+                self.cell_objects.setdefault(cell, []).append(obj)
+                touched.add(cell)
+        for cell in touched:
+            self.chunks.pop(cell, None)
+            if len(self.chunks) < self.max_chunks:
+                self._bake(cell)
+
+    def remove(self, objects):
+        # Chunks that lost objects are re-baked from what is left in them
+        removed = set(objects)
+        touched = set()
+        for obj in removed:
+            touched.update(grid_cells(obj.rect, self.chunk_size))
+        for cell in touched:
+            remaining = [o for o in self.cell_objects.get(cell, ()) if o not in removed]
+            baked = self.chunks.pop(cell, None) is not None
+            if remaining:
+                self.cell_objects[cell] = remaining
+                if baked:
+                    self._bake(cell)
+            else:
+                self.cell_objects.pop(cell, None)
+
+    def _bake(self, cell):
+        cs = self.chunk_size
+        cx, cy = cell
+        chunk = pygame.Surface((cs, cs), pygame.SRCALPHA)
+        for obj in self.cell_objects[cell]:
+            chunk.blit(obj.image, (obj.rect.x - cx * cs, obj.rect.y - cy * cs))
+        chunk = self.chunks[cell] = chunk.convert_alpha()
+        return chunk
+
+    def draw(self, win, ox, oy):
+        # Returns how many chunks were blitted
+        cs = self.chunk_size
+        view = pygame.Rect(math.floor(ox), math.floor(oy), WIDTH + 1, HEIGHT + 1)
+        drawn = 0
+        for cell in grid_cells(view, cs):
+            chunk = self.chunks.pop(cell, None)
+            if chunk is not None:
+                self.chunks[cell] = chunk
+            elif cell in self.cell_objects:
+                chunk = self._bake(cell)
+            else:
+                continue
+            # Floor so chunk pixels land where individually drawn objects would
+            win.blit(chunk, (math.floor(cell[0] * cs - ox), math.floor(cell[1] * cs - oy)))
+            drawn += 1
+        while len(self.chunks) > self.max_chunks:
+            del self.chunks[next(iter(self.chunks))]
+        return drawn
+
+
+# -----------------------------
+# Level
+# -----------------------------
+SOLID_NAMES = ('block', 'tiny_block')
+SPECIAL_TERRAIN_NAMES = ('mud', 'grass', 'ice')
+HAZARD_NAMES = ('fire', 'spike_head', 'saw')
+PICKUP_NAMES = ('melon', 'pineapple', 'strawberry')
+
+class Level:
+    """ Objects of a loaded map, sorted once into the collections the game loop works from """
+    def __init__(self, objects, start_pos=None):
+        self.start_pos = start_pos
+        self.grid = SpatialGrid(objects)
+        self.sort_objects(objects)
+
+        # Blocks and special terrain never move, so they are drawn from baked chunks
+        self.static = set(self.solids + self.special_terrain)
+        self.static_layer = StaticLayer(self.solids + self.special_terrain)
+
+        # Viewport culling state
+        self.tick = 0
+        self.drawn = 0
+        self.chunks_drawn = 0
+
+        # (object, level order) of everything removed since the last restore
+        self.removed = []
+
+    def __len__(self):
+        return len(self.objects)
+
+    def sort_objects(self, objects):
+        # `objects` in level order
+        self.objects = objects
+        self.solids = [o for o in objects if o.name in SOLID_NAMES]
+        self.special_terrain = [o for o in objects if o.name in SPECIAL_TERRAIN_NAMES]
+        self.hazards = [o for o in objects if o.name in HAZARD_NAMES]
+        self.checkpoints = [o for o in objects if o.name == 'check_point']
+        self.trampolines = [o for o in objects if o.name == 'trampoline']
+        self.pickups = [o for o in objects if o.name in PICKUP_NAMES]
+        # Only objects whose class actually animates; static blocks inherit a no-op loop
+        self.animated = [o for o in objects if type(o).loop is not BaseObject.loop]
+        self.end_point = next((o for o in objects if o.name == 'end_point'), None)
+
+    def stream(self, rect):
+        # Everything is resident; StreamingLevel loads and evicts around `rect`
+        return
+
+    def snapshot(self):
+        """ The level's play state as loaded; geometry, images and masks are shared, not copied """
+        return LevelSnapshot(self)
+
+    def restore(self, snapshot):
+        # Puts back removed objects and rewinds animation; cost follows what changed, not level size
+        if self.removed:
+            for obj, order in self.removed:
+                self.grid.insert(obj, order)
+            self.removed = []
+            self.objects = list(snapshot.objects)
+            self.solids = list(snapshot.solids)
+            self.special_terrain = list(snapshot.special_terrain)
+            self.hazards = list(snapshot.hazards)
+            self.checkpoints = list(snapshot.checkpoints)
+            self.trampolines = list(snapshot.trampolines)
+            self.pickups = list(snapshot.pickups)
+            self.animated = list(snapshot.animated)
+            self.end_point = snapshot.end_point
+        for obj, state in snapshot.states:
+            obj.load_state(state)
+        self.tick = snapshot.tick
+
+    def remove(self, obj):
+        self.objects.remove(obj)
+        self.removed.append((obj, self.grid.remove(obj)))
+        for group in (self.solids, self.special_terrain, self.hazards, self.checkpoints,
+                      self.trampolines, self.pickups, self.animated):
+            if obj in group:
+                group.remove(obj)
+        if obj is self.end_point:
+            self.end_point = None
+
+    def visible(self, view):
+        # Objects in view that are not part of the baked static layer
+        objs = [o for o in self.grid.query(view) if o not in self.static]
+        self.drawn = len(objs)
+        return objs
+
+    def draw_static(self, win, ox, oy):
+        self.chunks_drawn = self.static_layer.draw(win, ox, oy)
+
+    def animate(self, rect):
+        # Objects outside `rect` are not touched; they catch up from self.tick when they come back
+        self.tick += 1
+        for o in self.grid.query(rect):
+            o.animate(self.tick)
+
+    def cull_stats(self):
+        return {'objects': len(self.objects), 'drawn': self.drawn, 'chunks_drawn': self.chunks_drawn}
+
+
+class LevelSnapshot:
+    """ What Level.restore() needs to rewind a level: its object lists and each animated object's state """
+    def __init__(self, level):
+        self.objects = list(level.objects)
+        self.solids = list(level.solids)
+        self.special_terrain = list(level.special_terrain)
+        self.hazards = list(level.hazards)
+        self.checkpoints = list(level.checkpoints)
+        self.trampolines = list(level.trampolines)
+        self.pickups = list(level.pickups)
+        self.animated = list(level.animated)
+        self.end_point = level.end_point
+        self.tick = level.tick
+        self.states = [(obj, obj.save_state()) for obj in level.animated]
+
+
+STREAM_MAX_CHUNKS = 16      # resident chunk budget; chunks are 1024 px squares by default
+STREAM_LOADS_PER_STEP = 1   # look-ahead chunks loaded per step; chunks the view needs load at once
+
+class StreamingLevel(Level):
+    """
+    A level read from a chunked file (level_format.ChunkedLevelFile) that only
+    keeps the chunks around the camera built. stream() is called every step:
+    chunks overlapping the view load immediately, the ring around them loads a
+    few per step ahead of the player, and chunks outside the ring are evicted
+    oldest-first once more than max_chunks are resident.
+    """
+    def __init__(self, source, block_size=EDITOR_BLOCK_SIZE, max_chunks=STREAM_MAX_CHUNKS):
+        self.source = source
+        self.block_size = block_size
+        self.max_chunks = max_chunks
+        self.resident = {}      # chunk key -> objects built from it
+        self.last_wanted = {}   # chunk key -> tick it was last within the look-ahead ring
+        self.consumed = set()   # original indices of objects removed in play, kept gone across reloads
+        self.loads = 0
+        self.evictions = 0
+        super().__init__([], source.start_pos)
+
+    def stream(self, rect):
+        cs = self.source.chunk_size
+        known = self.source.chunks
+        needed = [key for key in grid_cells(rect.inflate(CULL_MARGIN * 2, CULL_MARGIN * 2), cs) if key in known]
+        ring = [key for key in grid_cells(rect.inflate(cs * 2, cs * 2), cs) if key in known]
+        for key in ring:
+            self.last_wanted[key] = self.tick
+
+        changed = False
+        for key in needed:
+            if key not in self.resident:
+                self._load(key)
+                changed = True
+        ahead = [key for key in ring if key not in self.resident]
+        ahead.sort(key=lambda key: (key[0] * cs - rect.centerx) ** 2 + (key[1] * cs - rect.centery) ** 2)
+        for key in ahead[:STREAM_LOADS_PER_STEP]:
+            self._load(key)
+            changed = True
+
+        if len(self.resident) > self.max_chunks:
+            wanted = set(ring)
+            stale = sorted((key for key in self.resident if key not in wanted), key=self.last_wanted.get)
+            for key in stale[:len(self.resident) - self.max_chunks]:
+                self._evict(key)
+                changed = True
+        if changed:
+            self.sort_objects(sorted((o for objs in self.resident.values() for o in objs), key=self.grid.order.__getitem__))
+
+    def _load(self, key):
+        objects = []
+        for index, item in self.source.read_chunk(key):
+            if index in self.consumed:
+                continue
+            obj = build_object(item, self.block_size)
+            if obj is None:
+                continue
+            obj.stream_key = key
+            self.grid.insert(obj, index)
+            objects.append(obj)
+        self.resident[key] = objects
+        static = [o for o in objects if o.name in SOLID_NAMES or o.name in SPECIAL_TERRAIN_NAMES]
+        self.static.update(static)
+        self.static_layer.add(static)
+        self.loads += 1
+
+    def _evict(self, key):
+        objects = self.resident.pop(key)
+        for obj in objects:
+            self.grid.remove(obj)
+        static = [o for o in objects if o in self.static]
+        self.static.difference_update(static)
+        self.static_layer.remove(static)
+        self.evictions += 1
+
+    def remove(self, obj):
+        self.consumed.add(self.grid.remove(obj))
+        self.resident[obj.stream_key].remove(obj)
+        if obj in self.static:
+            self.static.discard(obj)
+            self.static_layer.remove([obj])
+        self.sort_objects([o for o in self.objects if o is not obj])
+
+    def snapshot(self):
+        # Nothing to copy: a restore drops every chunk and lets stream() rebuild them
+        return None
+
+    def restore(self, snapshot):
+        for key in list(self.resident):
+            self._evict(key)
+        self.consumed.clear()
+        self.last_wanted.clear()
+        self.tick = 0
+        self.sort_objects([])
+
+    def cull_stats(self):
+        stats = super().cull_stats()
+        stats['chunks_resident'] = len(self.resident)
+        return stats
+
+
 # Save / Load level
 def save_map(objects, key):
     fname = MAP_FILES[key]
@@ -517,45 +1086,153 @@ def save_map(objects, key):
 
 
 def load_map(filename='level_data_1.json', block_size=EDITOR_BLOCK_SIZE):
-    FULL_PATH = resource_path(join("assets", "Maps", filename))
-    if not exists(FULL_PATH):
-        return [], None
-    with open(FULL_PATH, 'r') as f:
-        data = json.load(f)
+    # JSON, binary (.lvl) or chunked (.lvls, streamed), whichever exists; see level_format
+    FULL_PATH = find_level_file(resource_path(join("assets", "Maps", filename)))
+    if FULL_PATH is None:
+        return Level([])
+    if is_chunked_level(FULL_PATH):
+        return StreamingLevel(ChunkedLevelFile(FULL_PATH), block_size)
+    data = PREFETCHER.get_json(FULL_PATH)
+    if data is None:
+        data = read_level(FULL_PATH)
     return load_level(data, block_size)
 
 
+def build_object(item, block_size):
+    # One level item -> its game object, or None for names the game does not know
+    name = item.get('name')
+    x = item.get('x', 0)
+    y = item.get('y', 0)
+    if name == 'block':
+        return Block(x, y, block_size, item.get('variant_x', 96), item.get('variant_y', 0))
+    elif name == 'tiny_block':
+        return Block(x, y, 48, item.get('variant_x', 144), item.get('variant_y', 0))
+    elif name in ('mud', 'grass', 'ice'):
+        return SpecialBlock(x, y, name, block_size, item.get('variant_x', 0),item.get('variant_y', 0))
+    elif name == 'fire':
+        return Fire(x, y, BASE_TILE_SIZE, BASE_TILE_SIZE * 2)
+    elif name == 'spike_head':
+        return SpikeHead(x, y, BASE_TILE_SIZE * 2, BASE_TILE_SIZE * 2)
+    elif name == 'saw':
+        return Saw(x, y, BASE_TILE_SIZE * 2, BASE_TILE_SIZE * 2)
+    elif name == 'trampoline':
+        return Trampoline(x, y)
+    elif name in ("melon", "pineapple", "strawberry"):
+        return Fruit(x, y, name)
+    elif name == 'start_point':
+        return StartPoint(x, y, block_size)
+    elif name == 'end_point':
+        return EndPoint(x, y, block_size)
+    elif name in ('check_point', 'checkpoint'):
+        return CheckPoint(x, y, block_size)
+    return None
+
+
 def load_level(data, block_size):
     objects = []
     start_pos = None 
     for item in data:
-        name = item.get('name')
-        x = item.get('x', 0)
-        y = item.get('y', 0)
-        if name == 'block':
-            objects.append(Block(x, y, block_size, item.get('variant_x', 96), item.get('variant_y', 0)))
-        elif name == 'tiny_block':
-            objects.append(Block(x, y, 48, item.get('variant_x', 144), item.get('variant_y', 0)))
-        elif name in ('mud', 'grass', 'ice'):
-            objects.append(SpecialBlock(x, y, name, block_size, item.get('variant_x', 0),item.get('variant_y', 0)))
-        elif name == 'fire':
-            objects.append(Fire(x, y, BASE_TILE_SIZE, BASE_TILE_SIZE * 2))
-        elif name == 'spike_head':
-            objects.append(SpikeHead(x, y, BASE_TILE_SIZE * 2, BASE_TILE_SIZE * 2))
-        elif name == 'saw':
-            objects.append(Saw(x, y, BASE_TILE_SIZE * 2, BASE_TILE_SIZE * 2))
-        elif name == 'trampoline':
-            objects.append(Trampoline(x, y))
-        elif name in ("melon", "pineapple", "strawberry"):
-            objects.append(Fruit(x, y, name))
-        elif name == 'start_point':
-            start_pos = (x, y)
-            objects.append(StartPoint(x, y, block_size))
-        elif name == 'end_point':
-            objects.append(EndPoint(x, y, block_size))
-        elif name in ('check_point', 'checkpoint'):
-            objects.append(CheckPoint(x, y, block_size))
-    return objects, start_pos
+        obj = build_object(item, block_size)
+        if obj is None:
+            continue
+        if obj.name == 'start_point':
+            start_pos = (obj.rect.x, obj.rect.y)
+        objects.append(obj)
+    return Level(objects, start_pos)
+
+# -----------------------------
+# Prefetch and loading screen
+# -----------------------------
+MUSIC_PATH = join('assets', 'Audio', 'game.mp3')
+
+# Images any level can use, besides the player sheets and backgrounds
+PREFETCH_IMAGES = [
+    join("assets", "Terrain", "Terrain.png"),
+    join("assets", "Traps", "Climate", "Special.png"),
+    join("assets", "Traps", "Spike Head", "Blink.png"),
+    join("assets", "Traps", "Fire", "on.png"),
+    join("assets", "Traps", "Saw", "on.png"),
+    join("assets", "Traps", "Trampoline", "Idle.png"),
+    join("assets", "Traps", "Trampoline", "Jump.png"),
+    join("assets", "Items", "Checkpoints", "Checkpoint", "Idle.png"),
+    join("assets", "Items", "Checkpoints", "Start", "start.png"),
+    join("assets", "Items", "Checkpoints", "End", "end.png"),
+    join("assets", "Other", "heart.png"),
+    join("assets", "Menu", "Buttons", "Restart.png"),
+    join("assets", "Menu", "Buttons", "Close.png"),
+] + list(PARTICLE_MAPPING.values()) + list(LEVEL_COMPLETE_ASSETS.values()) + [path for path, _ in Fruit.FRUIT_ASSETS.values()]
+
+# One of every object kind, built once to fill the shared frame, mask and tile caches
+WARMUP_LEVEL = [{'name': name} for name in SOLID_NAMES + SPECIAL_TERRAIN_NAMES + HAZARD_NAMES + PICKUP_NAMES +
+                ('trampoline', 'start_point', 'end_point', 'check_point')]
+
+_prefetch_queued = False
+_preloaded_levels = {}
+
+def warm_platformer():
+    build_tile_atlases()
+    load_level(WARMUP_LEVEL, EDITOR_BLOCK_SIZE)
+    Player(0, 0, 50, 50)
+    for kind in ParticleSystem.KINDS:
+        ParticleSystem.frames_for(kind)
+
+
+def preload_level(map_filename):
+    # Built ahead while the menu is idle; the next GameSession for this map takes it. Only the latest is kept.
+    if map_filename not in _preloaded_levels:
+        _preloaded_levels.clear()
+        _preloaded_levels[map_filename] = load_map(map_filename)
+
+
+def prefetch_platformer(map_filename=None):
+    """
+    Queues everything the level menu and every level need, plus map_filename's
+    level if given, dropping any other level's build still waiting in the queue
+    """
+    global _prefetch_queued
+    if map_filename is not None:
+        PREFETCHER.cancel_calls(lambda key: isinstance(key, tuple) and key[0] == 'level' and key[1] != map_filename)
+        PREFETCHER.request_call(lambda: preload_level(map_filename), key=('level', map_filename))
+    if _prefetch_queued:
+        return
+    _prefetch_queued = True
+    PREFETCHER.request_image(join('assets', 'Background', 'Menu.jpg'))
+    for i in range(1, 7):
+        PREFETCHER.request_image(join('assets', 'Menu', 'Levels', f'{i:02}.png'))
+    for name in MAP_FILES.values():
+        PREFETCHER.request_json(join('assets', 'Maps', name))
+    for name in BACKGROUND_MAPPING.values():
+        PREFETCHER.request_image(join('assets', 'Background', name), 'opaque')
+    sprite_dir = resource_path(join('assets', 'MainCharacters', 'MaskDude'))
+    for name in listdir(sprite_dir):
+        PREFETCHER.request_image(join(sprite_dir, name))
+    for path in PREFETCH_IMAGES:
+        PREFETCHER.request_image(path)
+    PREFETCHER.request_file(MUSIC_PATH)
+    PREFETCHER.request_call(warm_platformer)
+
+
+def draw_loading_screen(window, progress, font):
+    window.fill((20, 20, 30))
+    text = render_text(font, 'Loading...', (255, 255, 255))
+    window.blit(text, (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 - 60))
+    bar = pygame.Rect(WIDTH // 4, HEIGHT // 2, WIDTH // 2, 24)
+    pygame.draw.rect(window, (255, 255, 255), bar, 2)
+    pygame.draw.rect(window, (255, 105, 180), (bar.x + 4, bar.y + 4, int((bar.w - 8) * progress), bar.h - 8))
+
+
+def wait_for_prefetch(window, clock):
+    # Finishes whatever the idle menus did not get to, showing progress; False if the window was closed
+    font = try_font(FONT_PATH, 40)
+    while not PREFETCHER.pump(0.8 / FPS):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+        draw_loading_screen(window, PREFETCHER.progress(), font)
+        pygame.display.update()
+        clock.tick(FPS)
+    return True
+
 ##
 # Editor utilities
 def get_menu_background(name='Menu.jpg'):
@@ -571,31 +1248,47 @@ def draw_hud(window, player):
         window.blit(player.heart_image, (x, 10))
 
 
-def draw(window, bg_image, bg_w, bg_h, player, objects, ox, oy, inv, game_over=False, level_complete=False):
-    parallax = 0.5
-    bg_ox = int(ox * parallax)
-    bg_oy = int(oy * parallax)
-    start_x = math.floor(bg_ox / bg_w) * bg_w
-    start_y = math.floor(bg_oy / bg_h) * bg_h
-    for x in range(start_x, start_x + WIDTH + bg_w, bg_w):
-        for y in range(start_y, start_y + HEIGHT + bg_h, bg_h):
-            window.blit(bg_image, (x - bg_ox, y - bg_oy))
+def draw(window, background, player, objects, ox, oy, inv, game_over=False, level_complete=False, level=None,
+         player_shift=(0, 0), font=None):
+    # player_shift moves the player sprite off its rect, for interpolated rendering
+    background.draw(window, ox, oy)
+    if level is not None:
+        level.draw_static(window, ox, oy)
     for obj in objects:
         obj.draw(window, ox, oy)
-    player.draw(window, ox, oy, inv)
+    player.draw(window, ox - player_shift[0], oy - player_shift[1], inv)
     draw_hud(window, player)
     if game_over:
-        t = FONT.render('GAME OVER! Resetting', True, (255, 0, 0))
+        t = render_text(font or try_font(FONT_PATH, 40), 'GAME OVER! Resetting', (255, 0, 0))
         window.blit(t, (WIDTH//2 - t.get_width()//2, HEIGHT//2))
 
 
-def draw_completion_screen(window, current_time, restart_btn, close_btn):
-    win_w, win_h = window.get_size()
+_completion_surfaces = {}
 
-    dim_surface = pygame.Surface((win_w, win_h))
-    dim_surface.set_alpha(150)
-    dim_surface.fill(('black'))
-    window.blit(dim_surface, (0, 0))
+def completion_surfaces(size, stars_achieved):
+    # The dimming overlay and the scaled star image, built on the first frame the screen shows
+    key = (size, stars_achieved)
+    if key not in _completion_surfaces:
+        dim_surface = pygame.Surface(size)
+        dim_surface.set_alpha(150)
+        dim_surface.fill(('black'))
+
+        completion_image_path = resource_path(LEVEL_COMPLETE_ASSETS.get(stars_achieved, LEVEL_COMPLETE_ASSETS.get(1)))
+        completion_image = load_image(completion_image_path, (500, 300))
+
+        target_width = 600
+        if completion_image.get_width() > target_width:
+            scale_factor = target_width / completion_image.get_width()
+            completion_image = pygame.transform.scale(
+                completion_image,
+                (target_width, int(completion_image.get_height() * scale_factor))
+            )
+        _completion_surfaces[key] = dim_surface, completion_image
+    return _completion_surfaces[key]
+
+
+def draw_completion_screen(window, current_time, restart_btn, close_btn, font):
+    win_w, win_h = window.get_size()
 
     if current_time <= TIME_FOR_3_STARS:
         stars_achieved = 3
@@ -606,22 +1299,14 @@ def draw_completion_screen(window, current_time, restart_btn, close_btn):
     else:
         stars_achieved = 0
 
-    completion_image_path = resource_path(LEVEL_COMPLETE_ASSETS.get(stars_achieved, LEVEL_COMPLETE_ASSETS.get(1)))
-    completion_image = load_image(completion_image_path, (500, 300))
-
-    target_width = 600
-    if completion_image.get_width() > target_width:
-        scale_factor = target_width / completion_image.get_width()
-        completion_image = pygame.transform.scale(
-            completion_image,
-            (target_width, int(completion_image.get_height() * scale_factor))
-        )
+    dim_surface, completion_image = completion_surfaces((win_w, win_h), stars_achieved)
+    window.blit(dim_surface, (0, 0))
 
     image_x = (win_w - completion_image.get_width()) // 2
     image_y = (win_h - completion_image.get_height()) // 2 - 100
     window.blit(completion_image, (image_x, image_y))
 
-    time_text = FONT.render(f"Time: {current_time:.2f} seconds", 1, (255, 255, 255))
+    time_text = render_text(font, f"Time: {current_time:.2f} seconds", (255, 255, 255))
     time_text_x = (win_w - time_text.get_width()) // 2
     time_text_y = image_y + completion_image.get_height() + 20
     window.blit(time_text, (time_text_x, time_text_y))
@@ -641,10 +1326,16 @@ def draw_completion_screen(window, current_time, restart_btn, close_btn):
 
 
 # Collision & Movement
-def handle_vertical_collision(player, objects, dy):
-    collidable = [o for o in objects if o.name in ('block', 'tiny_block', 'mud', 'grass', 'ice')]
+def handle_vertical_collision(player, level, dy):
+    grid = level.grid
     collided = []
-    for o in collidable:
+    candidates = grid.query(player.rect)
+    i = 0
+    while i < len(candidates):
+        o = candidates[i]
+        i += 1
+        if o.name not in SOLID_NAMES and o.name not in SPECIAL_TERRAIN_NAMES:
+            continue
         if pygame.sprite.collide_mask(player, o):
             if dy > 0:
                 player.rect.bottom = o.rect.top
@@ -653,14 +1344,18 @@ def handle_vertical_collision(player, objects, dy):
                 player.rect.top = o.rect.bottom
                 player.hit_head()
             collided.append(o)
+            if dy != 0:
+                # The player was pushed: test the objects after this one at the new position
+                candidates = grid.query(player.rect, after=o)
+                i = 0
     return collided
 
 
-def collide(player, objects, dx):
+def collide(player, level, dx):
     player.move(dx, 0)
     player.update()
     result = None
-    for o in [x for x in objects if x.name in ('block', 'tiny_block', 'end_point')]:
+    for o in [x for x in level.grid.query(player.rect) if x.name in SOLID_NAMES or x is level.end_point]:
         if pygame.sprite.collide_mask(player, o):
             result = o
             break
@@ -669,17 +1364,15 @@ def collide(player, objects, dx):
     return result
 
 
-def handle_end_collision(player, objects):
-    for o in objects:
-        if o.name == 'end_point' and pygame.sprite.collide_mask(player, o):
-            return True
-    return False
+def handle_end_collision(player, level):
+    end = level.end_point
+    return end is not None and pygame.sprite.collide_mask(player, end) is not None
 
 # Special terrain handling
-def handle_special_terrain(player, objects):
+def handle_special_terrain(player, level):
     # Temporarily move player down to detect floor
     player.move(0, 1)
-    collided_blocks = pygame.sprite.spritecollide(player, objects, False, pygame.sprite.collide_mask)
+    collided_blocks = pygame.sprite.spritecollide(player, level.grid.query(player.rect), False, pygame.sprite.collide_mask)
     player.move(0, -1)
 
     on_special_block = False
@@ -728,9 +1421,10 @@ def handle_special_terrain(player, objects):
 
 
 # Player movement, collisions, and pickups
-def handle_move(player, objects, particles):
-    handle_special_terrain(player, objects)
-    keys = pygame.key.get_pressed()
+def handle_move(player, level, particles, keys=None, rng=random):
+    handle_special_terrain(player, level)
+    if keys is None:
+        keys = pygame.key.get_pressed()
     player_speed = PLAYER_VEL * player.terrain_modifier
 
     desired_x_vel = 0
@@ -752,29 +1446,32 @@ def handle_move(player, objects, particles):
             player.x_vel = max(min(player.x_vel, max_speed), -max_speed)
 
     # Horizontal collision
-    if player.x_vel != 0 and collide(player, objects, player.x_vel):
+    if player.x_vel != 0 and collide(player, level, player.x_vel):
         player.x_vel = 0
 
     # Vertical collision
-    handle_vertical_collision(player, objects, player.y_vel)
+    handle_vertical_collision(player, level, player.y_vel)
+
+    # Everything the player overlaps after moving
+    nearby = level.grid.query(player.rect)
 
     # Traps
-    for trap in [o for o in objects if o.name in ('fire', 'spike_head', 'saw')]:
+    for trap in [o for o in nearby if o.name in HAZARD_NAMES]:
         if pygame.sprite.collide_mask(player, trap) and player.lives_invincibility_timer <= 0:
             player.make_hit()
 
     # Checkpoints
-    for cp in [o for o in objects if o.name == 'check_point']:
+    for cp in level.checkpoints:
         if pygame.sprite.collide_mask(player, cp):
             player.start_pos = (cp.rect.x, cp.rect.y)
 
     # Trampolines
-    for t in [o for o in objects if o.name == 'trampoline']:
+    for t in level.trampolines:
         if player.rect.colliderect(t.rect) and player.y_vel >= 0 and player.rect.bottom <= t.rect.top + 10:
             t.bounce(player)
 
     # Fruit pickups
-    for fruit in [o for o in objects if o.name in ("melon", "pineapple", "strawberry")]:
+    for fruit in [o for o in nearby if o.name in PICKUP_NAMES]:
         if pygame.sprite.collide_mask(player, fruit):
             if fruit.name == "melon":
                 player.melon_active = True
@@ -786,31 +1483,174 @@ def handle_move(player, objects, particles):
             elif fruit.name == "strawberry":
                 if player.lives < 5:
                     player.lives += 1
-            objects.remove(fruit)
+            level.remove(fruit)
 
     # Particle effects for movement
     is_moving = keys[pygame.K_LEFT] or keys[pygame.K_RIGHT]
     if is_moving and player.y_vel == 0 and player.animation_count % 3 == 0:
         terrain_type = player.current_terrain_effect
-        image_path = PARTICLE_MAPPING.get(terrain_type, PARTICLE_MAPPING['regular'])
         px = player.rect.centerx
         py = player.rect.bottom
         vel_x = -player.x_vel * 0.1
 
         for _ in range(2):
-            scatter_x = vel_x + (random.random() * 2 - 1) * 0.5
-            scatter_y = random.uniform(-2, -4)
-            new_particle = Particle(px, py, image_path, velocity=(scatter_x, scatter_y), lifetime=random.randint(15, 25))
-            particles.add(new_particle)
+            scatter_x = vel_x + (rng.random() * 2 - 1) * 0.5
+            scatter_y = rng.uniform(-2, -4)
+            particles.spawn(px, py, scatter_x, scatter_y, rng.randint(15, 25), terrain_type, rng)
+
+
+# -----------------------------
+# Game session
+# -----------------------------
+class GameSession:
+    """
+    One play-through of a level, stepped a frame at a time with no window,
+    clock or keyboard of its own. All its randomness comes from `seed`, and a
+    recorder (see replay.py), if given, gets the input of every step.
+    """
+    def __init__(self, map_filename, block_size=EDITOR_BLOCK_SIZE, data=None, profiler=None, seed=None, recorder=None):
+        # `data` is an already-parsed level (e.g. a generated one) used instead of reading map_filename
+        self.map_filename = map_filename
+        self.rng = random.Random(seed)
+        self.recorder = recorder
+        self.profiler = profiler if profiler is not None else FrameProfiler(enabled=False)
+        self.block_size = block_size
+        self.data = data
+        build_tile_atlases()
+        self.level = self.load()
+        self.snapshot = self.level.snapshot()
+
+        DEFAULT_START = (100, HEIGHT - EDITOR_BLOCK_SIZE * 2)
+        self.initial = self.level.start_pos if self.level.start_pos else DEFAULT_START
+        self.particles = ParticleSystem()
+        self.font = try_font(FONT_PATH, 40)     # resolved once, not on every frame that draws text
+        self.frame = 0
+        self.pending_jumps = 0
+        self.reset()
+
+    def reset(self):
+        # Back to the level exactly as loaded, without touching the disk; used on game over and by Restart
+        if self.recorder is not None and self.frame:
+            self.recorder.press('reset')
+        self.level.restore(self.snapshot)
+        self.player = Player(self.initial[0], self.initial[1], 50, 50)
+        self.particles.clear()
+        self.game_over = False
+        self.level_complete = False
+        self.offset_x = self.initial[0] - (WIDTH // 2)
+        self.offset_y = self.initial[1] - (HEIGHT // 2)
+        self.level.stream(self.view().union(self.player.rect))
+        self.pending_jumps = 0
+        self.snapshot_previous()
+
+    def snapshot_previous(self):
+        # State drawn at alpha=0; teleports call this so they are not smeared across a frame
+        self.prev_player = self.player.rect.topleft
+        self.prev_offset = (self.offset_x, self.offset_y)
+
+    def load(self):
+        if self.data is not None:
+            return load_level(self.data, self.block_size)
+        level = _preloaded_levels.pop(self.map_filename, None) if self.block_size == EDITOR_BLOCK_SIZE else None
+        return level if level is not None else load_map(self.map_filename, self.block_size)
+
+    def jump(self):
+        player = self.player
+        max_jumps = 2 if player.current_terrain_effect != 'mud' else 1
+        if player.jump_count < max_jumps:
+            player.jump()
+
+    def queue_jump(self):
+        # Applied at the start of the next step, so jumps land on the same tick at any render rate
+        self.pending_jumps += 1
+
+    def view(self):
+        return pygame.Rect(int(self.offset_x), int(self.offset_y), WIDTH, HEIGHT)
+
+    def step(self, keys=None):
+        player = self.player
+        level = self.level
+        self.frame += 1
+        self.snapshot_previous()
+        if self.recorder is not None:
+            self.recorder.press('jump', self.pending_jumps)
+            self.recorder.record(pygame.key.get_pressed() if keys is None else keys)
+        while self.pending_jumps:
+            self.pending_jumps -= 1
+            self.jump()
+
+        if not self.game_over and not self.level_complete:
+            level.stream(self.view().union(player.rect))
+            self.profiler.mark('stream')
+            player.loop(FPS)
+            handle_move(player, level, self.particles, keys, self.rng)
+            self.profiler.mark('handle_move')
+
+            # Check end point
+            if handle_end_collision(player, level):
+                self.level_complete = True
+
+            # Check death plane
+            if player.rect.y > DEATH_PLANE_HEIGHT and player.lives_invincibility_timer <= 0:
+                player.make_hit()
+
+            # Handle hits
+            if player.hit:
+                if player.lives_invincibility_timer <= 0:
+                    player.lives -= 1
+                    player.lives_invincibility_timer = FPS * 3
+                    if player.lives <= 0:
+                        self.game_over = True
+                    else:
+                        player.rect.topleft = player.start_pos
+                        player.x_vel = player.y_vel = 0
+                        self.offset_x = player.start_pos[0] - (WIDTH // 2)
+                        self.offset_y = player.start_pos[1] - (HEIGHT // 2)
+                        self.snapshot_previous()
+                player.hit = False
+
+            # Camera follow
+            if ((player.rect.right - self.offset_x >= WIDTH - 200 and player.x_vel > 0) or
+                (player.rect.left - self.offset_x <= 200 and player.x_vel < 0)):
+                self.offset_x += player.x_vel
+            target_y = player.rect.y - (HEIGHT // 2)
+            self.offset_y += (target_y - self.offset_y) * 0.1
+            self.profiler.mark('game_logic')
+
+        # Animate objects near the camera or the player, and particles
+        margin = CULL_MARGIN * 2
+        level.animate(self.view().inflate(margin, margin).union(player.rect.inflate(margin, margin)))
+        self.profiler.mark('animate')
+        self.particles.update()
+        self.profiler.mark('particles')
+
+    def counts(self):
+        stats = self.level.cull_stats()
+        stats['particles'] = len(self.particles)
+        return stats
+
+    def draw(self, window, background, alpha=1.0):
+        # alpha blends from the state before the last step (0) to the current one (1)
+        level = self.level
+        player = self.player
+        ox = self.prev_offset[0] + (self.offset_x - self.prev_offset[0]) * alpha
+        oy = self.prev_offset[1] + (self.offset_y - self.prev_offset[1]) * alpha
+        shift = ((self.prev_player[0] - player.rect.x) * (1 - alpha),
+                 (self.prev_player[1] - player.rect.y) * (1 - alpha))
+        view = pygame.Rect(int(ox), int(oy), WIDTH, HEIGHT)
+        draw(window, background, player, level.visible(view.inflate(2, 2)), ox, oy,
+             player.lives_invincibility_timer, self.game_over, self.level_complete, level, shift, self.font)
+        self.particles.draw(window, ox, oy)
 
 
 # Main menu
 def main_menu(window=None):
     if window is None:
-        window = pygame.display.set_mode((900, 500))
+        window = get_window((WIDTH, HEIGHT))
     clock = pygame.time.Clock()
+    prefetch_platformer()
     menu_bg = get_menu_background()
-    title = MENU_FONT.render('PLATFORMER', True, (255, 105, 180))
+    title = render_text(try_font(FONT_PATH, 80), 'PLATFORMER', (255, 105, 180))
     title_x = WIDTH // 2 - title.get_width() // 2
     title_y = HEIGHT // 5
 
@@ -834,14 +1674,27 @@ def main_menu(window=None):
         buttons.append(Button(x, button_y, button_paths[i], map_files[i]))
         x += button_size + spacing
 
+    # Nothing on the menu moves, so it is composed once
+    scene = menu_bg.copy()
+    scene.blit(title, (title_x, title_y))
+    for b in buttons:
+        b.draw(scene)
+    renderer = DirtyRenderer(window, scene)
+
     selected = None
     run = True
     while run:
         clock.tick(FPS)
         for event in pygame.event.get():
+            renderer.handle_event(event)
             if event.type == pygame.QUIT:
                 pygame.quit()
                 return 'quit'
+            # The level under the cursor is the likely next one: build it ahead
+            if event.type == pygame.MOUSEMOTION:
+                for b in buttons:
+                    if b.check_click(event.pos):
+                        prefetch_platformer(b.map_file)
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 for b in buttons:
                     if b.check_click(event.pos):
@@ -849,29 +1702,28 @@ def main_menu(window=None):
                         run = False
                         break
 
-        window.blit(menu_bg, (0, 0))
-        window.blit(title, (title_x, title_y))
-        for b in buttons:
-            b.draw(window)
-        pygame.display.update()
+        renderer.begin()
+        renderer.present()
+        PREFETCHER.pump()
 
     return selected
 
 def main(window, map_filename):
     clock = pygame.time.Clock()
+    # Only this level is waited for; builds queued for levels merely hovered are dropped
+    prefetch_platformer(map_filename)
+    if not wait_for_prefetch(window, clock):
+        return 'quit'
 
     # Background
     bg_name = BACKGROUND_MAPPING.get(map_filename, 'Blue.png')
-    bg_img, bg_w, bg_h = get_background(bg_name)
-
-    # Load level objects
-    objects, start_pos = load_map(map_filename, EDITOR_BLOCK_SIZE)
-    trampolines = [o for o in objects if o.name == 'trampoline']
+    background = get_parallax_background(bg_name)
 
-    # Player setup
-    DEFAULT_START = (100, HEIGHT - EDITOR_BLOCK_SIZE * 2)
-    player_start = start_pos if start_pos else DEFAULT_START
-    player = Player(player_start[0], player_start[1], 50, 50)
+    # Level, player and camera
+    profiler = FrameProfiler()
+    settings = {'map_filename': map_filename, 'seed': new_seed()}
+    recorder = start_recording('platformer', settings)
+    session = GameSession(profiler=profiler, recorder=recorder, **settings)
 
     # UI buttons
     restart_btn = GameButton(WIDTH - 58, 10, join('assets', 'Menu', 'Buttons', 'Restart.png'), (48, 48))
@@ -879,137 +1731,103 @@ def main(window, map_filename):
 
     start_time = pygame.time.get_ticks()
     final_time = None
-    particles = pygame.sprite.Group()
 
-    # Camera offset
-    offset_x = player_start[0] - (WIDTH // 2)
-    offset_y = player_start[1] - (HEIGHT // 2)
+    # Background music; already streaming if we came from the level menu or another level
+    AUDIO.play_music(MUSIC_PATH)
 
-    # Background music
-    MUSIC_FILE = resource_path(join('assets', 'Audio', 'game.mp3'))
-    pygame.mixer.music.load(MUSIC_FILE)
-    pygame.mixer.music.play(-1)
-
-    game_over = False
-    level_complete = False
-    INITIAL = player_start
+    # Fixed-step simulation: render as often as RENDER_FPS (or vsync) allows and
+    # run however many whole steps of SIM_DT the elapsed time covers
+    render_fps = 0 if VSYNC else RENDER_FPS
+    accumulator = 0.0
+    previous = time.perf_counter()
 
     run = True
     while run:
-        clock.tick(FPS)
+        clock.tick(render_fps)
+        now = time.perf_counter()
+        elapsed = min(now - previous, MAX_FRAME_TIME)
+        previous = now
+        whole_steps = round(elapsed / SIM_DT)
+        if whole_steps and abs(elapsed - whole_steps * SIM_DT) < DT_SNAP:
+            elapsed = whole_steps * SIM_DT
+        accumulator += elapsed
+
+        profiler.begin_frame()
         for event in pygame.event.get():
+            profiler.handle_event(event)
             if event.type == pygame.QUIT:
-                pygame.mixer.music.stop()
+                AUDIO.stop_music()
+                finish_recording(recorder, session)
                 return 'quit'
 
             # Player jump
             if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                max_jumps = 2 if player.current_terrain_effect != 'mud' else 1
-                if player.jump_count < max_jumps:
-                    player.jump()
+                session.queue_jump()
 
             # Mouse clicks for buttons
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 mp = event.pos
                 if restart_btn.check_click(mp):
-                    # Reset level
-                    objects, start_pos = load_map(map_filename, EDITOR_BLOCK_SIZE)
-                    trampolines = [o for o in objects if o.name == 'trampoline']
-                    player.lives = LIVES_START
-                    player.start_pos = INITIAL
-                    player.rect.topleft = INITIAL
-                    player.x_vel = player.y_vel = 0
-                    game_over = False
-                    level_complete = False
+                    session.reset()
                     final_time = None
                     start_time = pygame.time.get_ticks()
-                    offset_x = INITIAL[0] - (WIDTH // 2)
-                    offset_y = INITIAL[1] - (HEIGHT // 2)
+                    accumulator = 0.0
+                    previous = time.perf_counter()
                 if close_btn.check_click(mp):
-                    pygame.mixer.music.stop()
+                    finish_recording(recorder, session)
                     return 'menu'
 
+        profiler.mark('events')
+
         # Level completion timing
-        if level_complete and final_time is None:
+        if session.level_complete and final_time is None:
             final_time = (pygame.time.get_ticks() - start_time) / 1000.0
 
-        # Game logic
-        if not game_over and not level_complete:
-            player.loop(FPS)
-            handle_move(player, objects, particles)
-
-            # Check end point
-            if handle_end_collision(player, objects):
-                level_complete = True
-
-            # Check death plane
-            if player.rect.y > DEATH_PLANE_HEIGHT and player.lives_invincibility_timer <= 0:
-                player.make_hit()
-
-            # Handle hits
-            if player.hit:
-                if player.lives_invincibility_timer <= 0:
-                    player.lives -= 1
-                    player.lives_invincibility_timer = FPS * 3
-                    if player.lives <= 0:
-                        game_over = True
-                    else:
-                        player.rect.topleft = player.start_pos
-                        player.x_vel = player.y_vel = 0
-                        offset_x = player.start_pos[0] - (WIDTH // 2)
-                        offset_y = player.start_pos[1] - (HEIGHT // 2)
-                player.hit = False
-
-            # Camera follow
-            if ((player.rect.right - offset_x >= WIDTH - 200 and player.x_vel > 0) or
-                (player.rect.left - offset_x <= 200 and player.x_vel < 0)):
-                offset_x += player.x_vel
-            target_y = player.rect.y - (HEIGHT // 2)
-            offset_y += (target_y - offset_y) * 0.1
-
-        # Animate objects and particles
-        for o in [x for x in objects if hasattr(x, 'loop')]:
-            o.loop()
-        particles.update()
+        # Game logic, animation and particles
+        keys = pygame.key.get_pressed()
+        steps = 0
+        while accumulator >= SIM_DT and steps < MAX_STEPS_PER_FRAME:
+            session.step(keys)
+            accumulator -= SIM_DT
+            steps += 1
+        if steps == MAX_STEPS_PER_FRAME:
+            # Too far behind to catch up: drop the backlog rather than spiral
+            accumulator = min(accumulator, SIM_DT)
 
         # Draw everything
-        draw(window, bg_img, bg_w, bg_h, player, objects, offset_x, offset_y, player.lives_invincibility_timer, game_over, level_complete)
-        for p in particles:
-            p.draw(window, offset_x, offset_y)
+        session.draw(window, background, min(1.0, accumulator / SIM_DT))
 
         # Completion screen or buttons
-        if level_complete and final_time is not None:
-            draw_completion_screen(window, final_time, restart_btn, close_btn)
+        if session.level_complete and final_time is not None:
+            draw_completion_screen(window, final_time, restart_btn, close_btn, session.font)
         else:
             restart_btn.rect.topleft = (WIDTH - 58, 10)
             close_btn.rect.topleft = (WIDTH - 116, 10)
             for b in [restart_btn, close_btn]:
                 b.draw(window)
+        profiler.mark('draw')
 
+        profiler.draw_overlay(window)
         pygame.display.update()
+        profiler.mark('display')
+        profiler.end_frame(session.counts())
 
         # Reset on game over
-        if game_over:
+        if session.game_over:
             pygame.time.delay(2000)
-            player.lives = LIVES_START
-            player.rect.topleft = INITIAL
-            player.start_pos = INITIAL
-            player.x_vel = player.y_vel = 0
-            game_over = False
-            level_complete = False
+            session.reset()
             final_time = None
             start_time = pygame.time.get_ticks()
-            offset_x = INITIAL[0] - (WIDTH // 2)
-            offset_y = INITIAL[1] - (HEIGHT // 2)
+            accumulator = 0.0
+            previous = time.perf_counter()
 
-    pygame.mixer.music.stop()
+    finish_recording(recorder, session)
     return 'menu'
 
 
 # Entry point
 if __name__ == '__main__':
-    pygame.init()
-    window = pygame.display.set_mode((900, 500))
+    window = get_window((WIDTH, HEIGHT), "Platformer")
     current_map = None
     current_menu = 'main'
 
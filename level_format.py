@@ -0,0 +1,302 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+# -----------------------------
+# Binary level format
+# -----------------------------
+# A level file is a header, a table of object kind names and one fixed-width
+# record per object:
+#
+#   header   magic 'ARLV', version, record count, string table length
+#   strings  kind names, UTF-8, each terminated by a zero byte
+#   records  x, y, kind (index into strings), variant_x, variant_y, width, height
+#
+# Every record field is a little-endian int32, so the whole record block loads
+# into one array('i') with a single copy and each field is a strided slice of
+# it; no per-record unpacking. variant_x/variant_y are VARIANT_NONE when the
+# object has no variant. Records decode to the same dicts as the JSON maps, so
+# load_level() takes either.
+MAGIC = b'ARLV'
+VERSION = 1
+HEADER = struct.Struct('<4sHII')
+FIELDS = ('x', 'y', 'kind', 'variant_x', 'variant_y', 'width', 'height')
+RECORD = struct.Struct('<' + 'i' * len(FIELDS))
+VARIANT_NONE = -1
+
+BINARY_EXT = '.lvl'
+CHUNKED_EXT = '.lvls'
+JSON_EXT = '.json'
+
+def encode_level(data):
+    """ Level items (dicts as in the JSON maps) -> bytes """
+    kinds = {}
+    records = bytearray()
+    for item in data:
+        name = item.get('name', '')
+        kind = kinds.setdefault(name, len(kinds))
+        records += RECORD.pack(
+            item.get('x', 0), item.get('y', 0), kind,
+            item.get('variant_x', VARIANT_NONE), item.get('variant_y', VARIANT_NONE),
+            item.get('width', 0), item.get('height', 0),
+        )
+    strings = b''.join(name.encode('utf-8') + b'\0' for name in kinds)
+    return HEADER.pack(MAGIC, VERSION, len(data), len(strings)) + strings + bytes(records)
+
+
+def decode_columns(buffer):
+    """ bytes-like (bytes, mmap, memoryview) -> (kind names, {field: sequence of ints}) """
+    magic, version, count, strings_len = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("not a binary level file")
+    if version != VERSION:
+        raise ValueError(f"unsupported level file version {version}")
+    start = HEADER.size
+    names = bytes(buffer[start:start + strings_len]).split(b'\0')[:-1]
+    names = [name.decode('utf-8') for name in names]
+    start += strings_len
+
+    values = array('i')
+    values.frombytes(buffer[start:start + count * RECORD.size])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    stride = len(FIELDS)
+    return names, {field: values[i::stride] for i, field in enumerate(FIELDS)}
+
+
+def decode_level(buffer):
+    """ bytes-like -> list of level items """
+    names, columns = decode_columns(buffer)
+    data = []
+    append = data.append
+    for record in zip(*(columns[field] for field in FIELDS)):
+        append(_record_item(names, *record))
+    return data
+
+
+def is_binary_level(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+# -----------------------------
+# Chunked levels
+# -----------------------------
+# For streaming: the same records, grouped by the square chunk of the world
+# their top-left corner falls in, each followed by its index in the original
+# item list so level order survives. The header carries the start point,
+# because the game needs it before any chunk is read.
+#
+#   header   magic 'ARLC', version, chunk size, record count, chunk count,
+#            string table length, has start, start x, start y
+#   strings  as above
+#   chunks   chunk x, chunk y, first record, record count (int32 each)
+#   records  the record fields above plus the original index (int32 each)
+CHUNKED_MAGIC = b'ARLC'
+CHUNKED_HEADER = struct.Struct('<4sHIIIIIii')
+CHUNK_ENTRY = struct.Struct('<iiII')
+CHUNKED_FIELDS = FIELDS + ('index',)
+CHUNKED_RECORD = struct.Struct('<' + 'i' * len(CHUNKED_FIELDS))
+STREAM_CHUNK_SIZE = 1024
+
+def encode_chunked(data, chunk_size=STREAM_CHUNK_SIZE):
+    kinds = {}
+    chunks = {}
+    start = None
+    for index, item in enumerate(data):
+        name = item.get('name', '')
+        kinds.setdefault(name, len(kinds))
+        if name == 'start_point':
+            start = (item.get('x', 0), item.get('y', 0))
+        key = (item.get('x', 0) // chunk_size, item.get('y', 0) // chunk_size)
+        chunks.setdefault(key, []).append(index)
+
+    table = bytearray()
+    records = bytearray()
+    first = 0
+    for (cx, cy), indices in sorted(chunks.items()):
+        table += CHUNK_ENTRY.pack(cx, cy, first, len(indices))
+        first += len(indices)
+        for index in indices:
+            item = data[index]
+            records += CHUNKED_RECORD.pack(
+                item.get('x', 0), item.get('y', 0), kinds[item.get('name', '')],
+                item.get('variant_x', VARIANT_NONE), item.get('variant_y', VARIANT_NONE),
+                item.get('width', 0), item.get('height', 0), index,
+            )
+    strings = b''.join(name.encode('utf-8') + b'\0' for name in kinds)
+    header = CHUNKED_HEADER.pack(CHUNKED_MAGIC, VERSION, chunk_size, len(data), len(chunks), len(strings),
+                                 start is not None, *(start or (0, 0)))
+    return header + strings + bytes(table) + bytes(records)
+
+
+def _record_item(names, x, y, kind, vx, vy, w, h):
+    item = {'name': names[kind], 'x': x, 'y': y, 'width': w, 'height': h}
+    if vx != VARIANT_NONE:
+        item['variant_x'] = vx
+        item['variant_y'] = vy
+    return item
+
+
+class ChunkedLevelFile:
+    """ A chunked level kept memory-mapped; chunks are decoded one at a time as the game asks for them """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.chunk_size, self.count, chunk_count, strings_len,
+         has_start, start_x, start_y) = CHUNKED_HEADER.unpack_from(self._map, 0)
+        if magic != CHUNKED_MAGIC:
+            raise ValueError("not a chunked level file")
+        if version != VERSION:
+            raise ValueError(f"unsupported level file version {version}")
+        self.start_pos = (start_x, start_y) if has_start else None
+
+        offset = CHUNKED_HEADER.size
+        names = self._map[offset:offset + strings_len].split(b'\0')[:-1]
+        self.names = [name.decode('utf-8') for name in names]
+        offset += strings_len
+
+        self.chunks = {}
+        for cx, cy, first, count in CHUNK_ENTRY.iter_unpack(self._map[offset:offset + chunk_count * CHUNK_ENTRY.size]):
+            self.chunks[(cx, cy)] = (first, count)
+        self._records = offset + chunk_count * CHUNK_ENTRY.size
+
+    def __len__(self):
+        return self.count
+
+    def read_chunk(self, key):
+        """ [(original index, item)] for one chunk; empty if the chunk has no objects """
+        entry = self.chunks.get(key)
+        if entry is None:
+            return []
+        first, count = entry
+        start = self._records + first * CHUNKED_RECORD.size
+        values = array('i')
+        values.frombytes(self._map[start:start + count * CHUNKED_RECORD.size])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        stride = len(CHUNKED_FIELDS)
+        return [(values[i + 7], _record_item(self.names, *values[i:i + 7])) for i in range(0, len(values), stride)]
+
+    def read_all(self):
+        # Every item, back in original order
+        indexed = [pair for key in self.chunks for pair in self.read_chunk(key)]
+        indexed.sort(key=lambda pair: pair[0])
+        return [item for _, item in indexed]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def is_chunked_level(path):
+    with open(path, 'rb') as f:
+        return f.read(len(CHUNKED_MAGIC)) == CHUNKED_MAGIC
+
+# -----------------------------
+# Reading and writing files
+# -----------------------------
+def _read_mapped(path, decode):
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return decode(view)
+            finally:
+                view.release()
+
+
+def read_binary(path):
+    return _read_mapped(path, decode_level)
+
+
+def read_columns(path):
+    """ (kind names, columns) of a binary level without building a dict per object """
+    return _read_mapped(path, decode_columns)
+
+
+def write_binary(path, data):
+    with open(path, 'wb') as f:
+        f.write(encode_level(data))
+
+
+def write_chunked(path, data, chunk_size=STREAM_CHUNK_SIZE):
+    with open(path, 'wb') as f:
+        f.write(encode_chunked(data, chunk_size))
+
+
+def read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    # Same layout save_map writes, so converted maps diff cleanly against hand-saved ones
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def read_level(path):
+    """ Level items from a JSON, binary or chunked level file, whichever it is """
+    if os.path.getsize(path) >= HEADER.size:
+        if is_binary_level(path):
+            return read_binary(path)
+        if is_chunked_level(path):
+            level = ChunkedLevelFile(path)
+            try:
+                return level.read_all()
+            finally:
+                level.close()
+    return read_json(path)
+
+
+def find_level_file(path):
+    # The file itself, or failing that the same level in the other format
+    if os.path.exists(path):
+        return path
+    stem, ext = os.path.splitext(path)
+    for other in (CHUNKED_EXT, BINARY_EXT, JSON_EXT):
+        if other != ext and os.path.exists(stem + other):
+            return stem + other
+    return None
+
+# -----------------------------
+# Converter
+# -----------------------------
+def convert(path, output=None, chunked=False, chunk_size=STREAM_CHUNK_SIZE):
+    """ JSON -> binary (or chunked) and binary/chunked -> JSON, by what the input is; returns the written path """
+    data = read_level(path)
+    to_json = is_binary_level(path) or is_chunked_level(path)
+    if output is None:
+        output = os.path.splitext(path)[0] + (JSON_EXT if to_json else CHUNKED_EXT if chunked else BINARY_EXT)
+    if to_json:
+        write_json(output, data)
+    elif chunked:
+        write_chunked(output, data, chunk_size)
+    else:
+        write_binary(output, data)
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert platformer levels between JSON and the binary .lvl format.")
+    parser.add_argument('files', nargs='+', help="level files; JSON becomes .lvl and .lvl/.lvls becomes JSON")
+    parser.add_argument('-o', '--output', help="output path (only with a single input file)")
+    parser.add_argument('--chunked', action='store_true', help="write a chunked .lvls for streaming instead of .lvl")
+    parser.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE, help="chunk size in pixels for --chunked")
+    args = parser.parse_args(argv)
+    if args.output and len(args.files) > 1:
+        parser.error("--output needs exactly one input file")
+
+    for path in args.files:
+        output = convert(path, args.output, args.chunked, args.chunk_size)
+        print(f"{path} ({os.path.getsize(path)} bytes) -> {output} ({os.path.getsize(output)} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import argparse
+import math
+import os
+import random
+import sys
+
+from level_format import write_json, write_binary, write_chunked, BINARY_EXT, CHUNKED_EXT
+
+# -----------------------------
+# Procedural stress levels
+# -----------------------------
+# Levels of any size (tested from 100 to 100k objects) for scaling tests, in
+# the same item schema the editor saves. The same count, seed and mix always
+# give the same level.
+#
+# Layout, in 96 px cells:
+#
+#   upper rows   everything else: blocks, hazards, trampolines, fruit, ...
+#   corridor     CORRIDOR_ROWS rows kept free of anything solid or harmful,
+#                apart from checkpoints standing on the floor
+#   floor        one unbroken row of blocks and ice/mud/grass runs
+#
+# The start point sits on the first floor cell. The end point sits in a pit
+# after the last one: a block under it and a two-block wall beyond it, since
+# the end point only counts when the player drops into it. Holding right
+# walks from start to end without touching a hazard.
+CELL = 96
+FLOOR_Y = 576               # top of the floor row; the death plane is at 700
+CORRIDOR_ROWS = 4
+OBJECTS_PER_COLUMN = 6      # sets the level's length: count / this many columns
+MIN_COLUMNS = 12
+UPPER_FILL = 0.5            # share of upper cells that get an object
+
+# Size of each kind as build_object() makes it
+SIZES = {
+    'block': (96, 96),
+    'tiny_block': (48, 48),
+    'ice': (96, 96),
+    'mud': (96, 96),
+    'grass': (96, 96),
+    'fire': (32, 64),
+    'saw': (64, 64),
+    'spike_head': (64, 64),
+    'trampoline': (96, 33),
+    'melon': (48, 48),
+    'pineapple': (48, 48),
+    'strawberry': (48, 48),
+    'check_point': (96, 96),
+    'start_point': (96, 96),
+    'end_point': (96, 96),
+}
+VARIANTS = {'block': (96, 0), 'tiny_block': (144, 0)}
+SPECIAL_TERRAIN = ('ice', 'mud', 'grass')
+
+# Roughly the mix of the shipped maps
+DEFAULT_MIX = {
+    'block': 36, 'tiny_block': 8, 'ice': 6, 'mud': 2, 'grass': 1,
+    'fire': 7, 'saw': 5, 'spike_head': 9, 'trampoline': 3,
+    'melon': 1, 'pineapple': 1, 'strawberry': 1, 'check_point': 3,
+}
+
+def allocate(total, mix):
+    """ Splits `total` objects over the kinds in `mix` by weight (largest remainder) """
+    weight = sum(mix.values())
+    if weight <= 0:
+        raise ValueError("mix needs at least one positive weight")
+    shares = {kind: total * w / weight for kind, w in mix.items()}
+    counts = {kind: int(share) for kind, share in shares.items()}
+    left = total - sum(counts.values())
+    for kind in sorted(shares, key=lambda k: counts[k] - shares[k])[:left]:
+        counts[kind] += 1
+    return counts
+
+
+def make_item(kind, cell_x, cell_y):
+    # Centred in the cell and standing on its bottom edge, like the editor places things
+    w, h = SIZES[kind]
+    item = {'name': kind, 'x': cell_x + (CELL - w) // 2, 'y': cell_y + CELL - h, 'width': w, 'height': h}
+    if kind in VARIANTS:
+        item['variant_x'], item['variant_y'] = VARIANTS[kind]
+    return item
+
+
+def floor_runs(rng, counts, columns):
+    # Floor kinds left to right: special terrain in runs of 2-5 between runs of blocks, plain blocks at both ends
+    specials = []
+    special_cells = 0
+    for kind in SPECIAL_TERRAIN:
+        left = min(counts.get(kind, 0), columns - 2 - special_cells)
+        counts[kind] = counts.get(kind, 0) - left
+        special_cells += left
+        while left > 0:
+            run = min(left, rng.randint(2, 5))
+            specials.append([kind] * run)
+            left -= run
+    blocks = columns - 2 - special_cells
+    block_runs = []
+    while blocks > 0:
+        run = min(blocks, rng.randint(2, 8))
+        block_runs.append(['block'] * run)
+        blocks -= run
+    runs = specials + block_runs
+    rng.shuffle(runs)
+    counts['block'] = max(0, counts.get('block', 0) - (columns - special_cells))
+    return ['block'] + [kind for run in runs for kind in run] + ['block']
+
+
+def generate_level(count, seed=0, mix=None):
+    """
+    A level of `count` objects (more only if the mix has too few blocks and
+    special terrain for the floor) as a list of items in the JSON map schema.
+    """
+    rng = random.Random(seed)
+    mix = DEFAULT_MIX if mix is None else mix
+    counts = allocate(max(0, count - 5), mix)
+    columns = max(MIN_COLUMNS, math.ceil(count / OBJECTS_PER_COLUMN))
+
+    data = [make_item('start_point', 0, FLOOR_Y - CELL)]
+
+    # Floor
+    for col, kind in enumerate(floor_runs(rng, counts, columns - 1)):
+        data.append(make_item(kind, col * CELL, FLOOR_Y))
+
+    # Checkpoints on the floor, evenly spaced between start and end
+    corridor_cps = min(counts.get('check_point', 0), columns - 2)
+    counts['check_point'] = counts.get('check_point', 0) - corridor_cps
+    for i in range(corridor_cps):
+        col = 1 + (i + 1) * (columns - 2) // (corridor_cps + 1)
+        data.append(make_item('check_point', col * CELL, FLOOR_Y - CELL))
+
+    # Upper rows: every remaining object in its own random cell, so nothing overlaps
+    upper = [kind for kind in mix if kind in SIZES for _ in range(max(0, counts.get(kind, 0)))]
+    rng.shuffle(upper)
+    rows = max(1, math.ceil(len(upper) / (columns * UPPER_FILL)))
+    top = FLOOR_Y - CELL * (CORRIDOR_ROWS + 1)
+    for kind, cell in zip(upper, rng.sample(range(columns * rows), len(upper))):
+        col, row = divmod(cell, rows)
+        data.append(make_item(kind, col * CELL, top - row * CELL))
+
+    # End pit
+    end_x = (columns - 1) * CELL
+    data.append(make_item('block', end_x, FLOOR_Y + CELL))
+    data.append(make_item('block', end_x + CELL, FLOOR_Y))
+    data.append(make_item('block', end_x + CELL, FLOOR_Y - CELL))
+    data.append(make_item('end_point', end_x, FLOOR_Y))
+    return data
+
+
+def write_level(path, data):
+    # Format by extension: .lvl binary, .lvls chunked, anything else JSON
+    ext = os.path.splitext(path)[1]
+    if ext == BINARY_EXT:
+        write_binary(path, data)
+    elif ext == CHUNKED_EXT:
+        write_chunked(path, data)
+    else:
+        write_json(path, data)
+    return path
+
+
+def parse_mix(text):
+    # "block=40,fire=5,..." -> {'block': 40, 'fire': 5}
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in SIZES or kind in ('start_point', 'end_point'):
+            raise ValueError(f"unknown object kind '{kind}'")
+        mix[kind] = float(weight) if weight else 1.0
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate seeded stress levels for the platformer.")
+    parser.add_argument('count', type=int, help="number of objects, e.g. 100 to 100000")
+    parser.add_argument('-o', '--output', nargs='+', help="level files to write; .json, .lvl or .lvls by extension")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mix', help="weights per kind, e.g. block=40,ice=10,fire=5 (default: like the shipped maps)")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix) if args.mix else None
+    except ValueError as e:
+        parser.error(str(e))
+    data = generate_level(args.count, args.seed, mix)
+    for path in args.output or [f'stress_{args.count}_{args.seed}.json']:
+        write_level(path, data)
+        print(f"{path}: {len(data)} objects, {os.path.getsize(path)} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
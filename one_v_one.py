@@ -1,75 +1,49 @@
 import pygame
-import os
-import sys
+from array import array
 from os.path import join
 
-# -------------------- Initialization --------------------
-pygame.font.init()
-pygame.mixer.init()
+from resources import resource_path, load_image, load_font as load_shared_font, render_text, load_sound, PREFETCHER
+from audio import play_sound
+from render import DirtyRenderer, get_window
+from profiler import FrameProfiler
+from replay import start_recording, finish_recording
 
 WIDTH, HEIGHT = 900, 500
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
 
 # -------------------- Helper Functions --------------------
-def resource_path(relative_path):
-    """
-    Get absolute path to resource, works for dev and PyInstaller.
-    """
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return join(base_path, relative_path)
-
 def load_font(size):
-    return pygame.font.Font(resource_path(join("assets", "Menu", "text", "Platform.TTF")), size)
-
-HEALTH_FONT = load_font(40)
-WINNER_FONT = load_font(100)
+    return load_shared_font(join("assets", "Menu", "Text", "Platform.TTF"), size)
 
 # -------------------- Shooter Game Functions --------------------
-def draw_window_shooter(WIN, WIDTH, HEIGHT, BORDER, red, yellow, red_bullets, yellow_bullets, red_health, yellow_health, bg, red_ship, yellow_ship, HEALTH_FONT):
-    WIN.blit(bg, (0, 0))
-    pygame.draw.rect(WIN, "black", BORDER)
+def make_shooter_background(bg, BORDER):
+    # Everything that never moves during a match
+    background = bg.copy()
+    pygame.draw.rect(background, "black", BORDER)
+    return background
 
-    red_health_text = HEALTH_FONT.render(f"Health: {red_health}", 1, "white")
-    yellow_health_text = HEALTH_FONT.render(f"Health: {yellow_health}", 1, "white")
-    WIN.blit(red_health_text, (WIDTH - red_health_text.get_width() - 10, 10))
-    WIN.blit(yellow_health_text, (10, 10))
+def draw_window_shooter(renderer, WIDTH, HEIGHT, BORDER, red, yellow, red_bullets, yellow_bullets, red_health, yellow_health, red_ship, yellow_ship, HEALTH_FONT):
+    renderer.begin()
 
-    WIN.blit(red_ship, (red.x, red.y))
-    WIN.blit(yellow_ship, (yellow.x, yellow.y))
+    red_health_text = render_text(HEALTH_FONT, f"Health: {red_health}", "white")
+    yellow_health_text = render_text(HEALTH_FONT, f"Health: {yellow_health}", "white")
+    renderer.blit(red_health_text, (WIDTH - red_health_text.get_width() - 10, 10))
+    renderer.blit(yellow_health_text, (10, 10))
 
-    for bullet in red_bullets:
-        pygame.draw.rect(WIN, "red", bullet)
-    for bullet in yellow_bullets:
-        pygame.draw.rect(WIN, "yellow", bullet)
+    renderer.blit(red_ship, (red.x, red.y))
+    renderer.blit(yellow_ship, (yellow.x, yellow.y))
 
-    pygame.display.update()
+    red_bullets.draw(renderer)
+    yellow_bullets.draw(renderer)
 
-def handle_bullets(yellow_bullets, red_bullets, yellow, red, BULLET_VEL, WIDTH, bullet_hit_sound):
-    red_hit = 0
-    yellow_hit = 0
-
-    for bullet in yellow_bullets[:]:
-        bullet.x += BULLET_VEL
-        if bullet.colliderect(red):
-            red_hit += 1
-            bullet_hit_sound.play()
-            yellow_bullets.remove(bullet)
-        elif bullet.x > WIDTH:
-            yellow_bullets.remove(bullet)
-
-    for bullet in red_bullets[:]:
-        bullet.x -= BULLET_VEL
-        if bullet.colliderect(yellow):
-            yellow_hit += 1
-            bullet_hit_sound.play()
-            red_bullets.remove(bullet)
-        elif bullet.x < 0:
-            red_bullets.remove(bullet)
+    renderer.present()
 
+def handle_bullets(yellow_bullets, red_bullets, yellow, red, WIDTH, bullet_hit_sound):
+    red_hit = yellow_bullets.step(red, WIDTH)
+    yellow_hit = red_bullets.step(yellow, WIDTH)
+    if red_hit:
+        play_sound('impact', bullet_hit_sound, 'red')
+    if yellow_hit:
+        play_sound('impact', bullet_hit_sound, 'yellow')
     return red_hit, yellow_hit
 
 def handle_movement(keys, yellow, red, VEL, WIDTH, HEIGHT, BORDER, SPACESHIP_WIDTH, SPACESHIP_HEIGHT):
@@ -94,71 +68,204 @@ def handle_movement(keys, yellow, red, VEL, WIDTH, HEIGHT, BORDER, SPACESHIP_WID
         red.y += VEL
 
 def draw_winner(text):
-    draw_text = WINNER_FONT.render(text, 1, "white")
-    WIN.blit(draw_text, (WIDTH / 2 - draw_text.get_width() / 2, HEIGHT / 2 - draw_text.get_height() / 2))
+    draw_text = render_text(load_font(100), text, "white")
+    get_window().blit(draw_text, (WIDTH / 2 - draw_text.get_width() / 2, HEIGHT / 2 - draw_text.get_height() / 2))
     pygame.display.update()
     pygame.time.delay(4000)
 
+# -------------------- Match State --------------------
+ASSETS_FOLDER = resource_path(join("assets", "Dual_game"))
+
+FPS = 60
+VEL = 5
+BULLET_VEL = 7
+BULLET_WIDTH, BULLET_HEIGHT = 10, 5
+MAX_BULLET = 5
+FIRE_RATE = 0       # frames between shots while fire is held; 0 = one shot per key press
+START_HEALTH = 10
+SPACESHIP_WIDTH, SPACESHIP_HEIGHT = 55, 40
+BORDER = pygame.Rect(WIDTH//2 - 5, 0, 10, HEIGHT)
+HIT_SOUND = join(ASSETS_FOLDER, 'Grenade+1.mp3')
+FIRE_SOUND = join(ASSETS_FOLDER, 'Gun+Silencer.mp3')
+
+def prefetch_shooter():
+    # Decodes the effects while the launcher is idle, so a match starts without decoding anything
+    PREFETCHER.request_sound(HIT_SOUND)
+    PREFETCHER.request_sound(FIRE_SOUND)
+
+class BulletPool:
+    """
+    One side's bullets in flat arrays allocated once at the magazine size; a
+    spent bullet's slot is filled by swapping in the last live one. Bullets
+    only move sideways, so each hit test sweeps the bullet over its whole step
+    and a fast bullet cannot skip past a ship between frames.
+    """
+    def __init__(self, capacity, direction, color, speed=BULLET_VEL):
+        self.capacity = capacity
+        self.count = 0
+        self.step_x = direction * speed
+        self.x = array('i', bytes(4 * capacity))
+        self.y = array('i', bytes(4 * capacity))
+        self.surface = pygame.Surface((BULLET_WIDTH, BULLET_HEIGHT))
+        self.surface.fill(color)
+
+    def __len__(self):
+        return self.count
+
+    def fire(self, x, y):
+        # False when the magazine is full
+        if self.count >= self.capacity:
+            return False
+        self.x[self.count] = x
+        self.y[self.count] = y
+        self.count += 1
+        return True
+
+    def step(self, target, width):
+        # Moves every bullet, drops the ones that hit `target` or left the screen; returns the hit count
+        x, y, dx = self.x, self.y, self.step_x
+        left = target.left - BULLET_WIDTH
+        right = target.right
+        top = target.top - BULLET_HEIGHT
+        bottom = target.bottom
+        hits = 0
+        i = 0
+        n = self.count
+        while i < n:
+            old = x[i]
+            new = x[i] = old + dx
+            if top < y[i] < bottom and min(old, new) < right and max(old, new) > left:
+                hits += 1
+            elif 0 <= new <= width:
+                i += 1
+                continue
+            # Spent: the last live bullet takes this slot
+            n -= 1
+            x[i] = x[n]
+            y[i] = y[n]
+        self.count = n
+        return hits
+
+    def draw(self, renderer):
+        if self.count:
+            renderer.blits(self.surface, zip(self.x[:self.count], self.y[:self.count]))
+
+    def clear(self):
+        self.count = 0
+
+
+class ShooterMatch:
+    """
+    One 1v1 match: fed events and key state each frame, with drawing kept
+    separate. max_bullets caps each side's bullets on screen; with fire_rate
+    set, holding fire shoots every fire_rate frames. A recorder (see
+    replay.py) gets every fire key press and every step's keys.
+    """
+    def __init__(self, max_bullets=MAX_BULLET, health=START_HEALTH, fire_rate=FIRE_RATE, bullet_speed=BULLET_VEL, recorder=None):
+        self.max_bullets = max_bullets
+        self.fire_rate = fire_rate
+        self.recorder = recorder
+
+        # Load assets
+        self.bg = pygame.transform.scale(load_image(join(ASSETS_FOLDER, '1v1.png'), 'opaque'), (WIDTH, HEIGHT))
+        self.red_ship = pygame.transform.rotate(
+            pygame.transform.scale(load_image(join(ASSETS_FOLDER, 'spaceship_red.png')), (SPACESHIP_WIDTH, SPACESHIP_HEIGHT)), 270
+        )
+        self.yellow_ship = pygame.transform.rotate(
+            pygame.transform.scale(load_image(join(ASSETS_FOLDER, 'spaceship_yellow.png')), (SPACESHIP_WIDTH, SPACESHIP_HEIGHT)), 90
+        )
+        self.bullet_hit_sound = load_sound(HIT_SOUND)
+        self.bullet_fire_sound = load_sound(FIRE_SOUND)
+        self.health_font = load_font(40)
+
+        # Initialize players
+        self.red = pygame.Rect(700, 300, SPACESHIP_WIDTH, SPACESHIP_HEIGHT)
+        self.yellow = pygame.Rect(100, 300, SPACESHIP_WIDTH, SPACESHIP_HEIGHT)
+        self.red_bullets = BulletPool(max_bullets, -1, "red", bullet_speed)
+        self.yellow_bullets = BulletPool(max_bullets, 1, "yellow", bullet_speed)
+        self.red_health = health
+        self.yellow_health = health
+        self.frame = 0
+        self.yellow_fired = self.red_fired = -fire_rate
+
+    def fire_yellow(self):
+        yellow = self.yellow
+        if self.yellow_bullets.fire(yellow.x + yellow.width, yellow.y + yellow.height // 2 - 2):
+            self.yellow_fired = self.frame
+            play_sound('shot', self.bullet_fire_sound, 'yellow')
+
+    def fire_red(self):
+        red = self.red
+        if self.red_bullets.fire(red.x, red.y + red.height // 2 - 2):
+            self.red_fired = self.frame
+            play_sound('shot', self.bullet_fire_sound, 'red')
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            if self.recorder is not None and event.key in (pygame.K_LCTRL, pygame.K_RCTRL):
+                self.recorder.press('fire_yellow' if event.key == pygame.K_LCTRL else 'fire_red')
+            if event.key == pygame.K_LCTRL and self.frame - self.yellow_fired >= self.fire_rate:
+                self.fire_yellow()
+            if event.key == pygame.K_RCTRL and self.frame - self.red_fired >= self.fire_rate:
+                self.fire_red()
+
+    def step(self, keys):
+        # Returns the winner's banner once a ship runs out of health
+        if self.recorder is not None:
+            self.recorder.record(keys)
+        self.frame += 1
+        if self.fire_rate:
+            if keys[pygame.K_LCTRL] and self.frame - self.yellow_fired >= self.fire_rate:
+                self.fire_yellow()
+            if keys[pygame.K_RCTRL] and self.frame - self.red_fired >= self.fire_rate:
+                self.fire_red()
+        handle_movement(keys, self.yellow, self.red, VEL, WIDTH, HEIGHT, BORDER, SPACESHIP_WIDTH, SPACESHIP_HEIGHT)
+
+        red_hits, yellow_hits = handle_bullets(self.yellow_bullets, self.red_bullets, self.yellow, self.red, WIDTH, self.bullet_hit_sound)
+        self.red_health -= red_hits
+        self.yellow_health -= yellow_hits
+
+        if self.red_health <= 0:
+            return "Yellow Wins!"
+        if self.yellow_health <= 0:
+            return "Red Wins!"
+        return None
+
+    def draw(self, renderer):
+        draw_window_shooter(renderer, WIDTH, HEIGHT, BORDER, self.red, self.yellow, self.red_bullets, self.yellow_bullets,
+                            self.red_health, self.yellow_health, self.red_ship, self.yellow_ship, self.health_font)
+
 # -------------------- Main Shooter Loop --------------------
 def main_shooter():
-    ASSETS_FOLDER = resource_path(join("assets", "Dual_game"))
-
-    FPS = 60
-    VEL = 5
-    BULLET_VEL = 7
-    MAX_BULLET = 5
-    SPACESHIP_WIDTH, SPACESHIP_HEIGHT = 55, 40
-    BORDER = pygame.Rect(WIDTH//2 - 5, 0, 10, HEIGHT)
-    
-    # Load assets
-    bg = pygame.transform.scale(pygame.image.load(join(ASSETS_FOLDER, '1v1.png')), (WIDTH, HEIGHT))
-    red_ship = pygame.transform.rotate(
-        pygame.transform.scale(pygame.image.load(join(ASSETS_FOLDER, 'spaceship_red.png')), (SPACESHIP_WIDTH, SPACESHIP_HEIGHT)), 270
-    )
-    yellow_ship = pygame.transform.rotate(
-        pygame.transform.scale(pygame.image.load(join(ASSETS_FOLDER, 'spaceship_yellow.png')), (SPACESHIP_WIDTH, SPACESHIP_HEIGHT)), 90
-    )
-    bullet_hit_sound = pygame.mixer.Sound(join(ASSETS_FOLDER, 'Grenade+1.mp3'))
-    bullet_fire_sound = pygame.mixer.Sound(join(ASSETS_FOLDER, 'Gun+Silencer.mp3'))
-
-    # Initialize players
-    red = pygame.Rect(700, 300, SPACESHIP_WIDTH, SPACESHIP_HEIGHT)
-    yellow = pygame.Rect(100, 300, SPACESHIP_WIDTH, SPACESHIP_HEIGHT)
-    red_bullets = []
-    yellow_bullets = []
-    red_health = 10
-    yellow_health = 10
+    window = get_window((WIDTH, HEIGHT))
+    recorder = start_recording('shooter', {})
+    match = ShooterMatch(recorder=recorder)
+    profiler = FrameProfiler()
+    renderer = DirtyRenderer(window, make_shooter_background(match.bg, BORDER), profiler=profiler)
 
     clock = pygame.time.Clock()
     run = True
     while run:
         clock.tick(FPS)
+        profiler.begin_frame()
         for event in pygame.event.get():
+            renderer.handle_event(event)
+            profiler.handle_event(event)
             if event.type == pygame.QUIT:
+                finish_recording(recorder, match)
                 return
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_LCTRL and len(yellow_bullets) < MAX_BULLET:
-                    yellow_bullets.append(pygame.Rect(yellow.x + yellow.width, yellow.y + yellow.height // 2 - 2, 10, 5))
-                    bullet_fire_sound.play()
-                if event.key == pygame.K_RCTRL and len(red_bullets) < MAX_BULLET:
-                    red_bullets.append(pygame.Rect(red.x, red.y + red.height // 2 - 2, 10, 5))
-                    bullet_fire_sound.play()
-
-        keys = pygame.key.get_pressed()
-        handle_movement(keys, yellow, red, VEL, WIDTH, HEIGHT, BORDER, SPACESHIP_WIDTH, SPACESHIP_HEIGHT)
-
-        red_hits, yellow_hits = handle_bullets(yellow_bullets, red_bullets, yellow, red, BULLET_VEL, WIDTH, bullet_hit_sound)
-        red_health -= red_hits
-        yellow_health -= yellow_hits
-
-        if red_health <= 0: 
-            draw_winner("Yellow Wins!")
-            return
-        if yellow_health <= 0: 
-            draw_winner("Red Wins!")
+            match.handle_event(event)
+        profiler.mark('events')
+
+        winner = match.step(pygame.key.get_pressed())
+        profiler.mark('update')
+        if winner:
+            finish_recording(recorder, match)
+            draw_winner(winner)
             return
-       
-        draw_window_shooter(WIN, WIDTH, HEIGHT, BORDER, red, yellow, red_bullets, yellow_bullets, red_health, yellow_health, bg, red_ship, yellow_ship, HEALTH_FONT)
+
+        match.draw(renderer)
+        profiler.end_frame({'bullets': len(match.red_bullets) + len(match.yellow_bullets)})
 
 # -------------------- Run --------------------
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+import pygame
+import json
+import os
+import time
+from collections import deque
+
+# -----------------------------
+# Frame profiler
+# -----------------------------
+# ARCADE_PROFILE=1 starts recording straight away. In game, F3 toggles
+# recording and the overlay, F4 writes a Chrome trace (chrome://tracing or
+# https://ui.perfetto.dev) of the recorded history.
+PROFILE = os.environ.get("ARCADE_PROFILE", "0") == "1"
+HISTORY_FRAMES = 240
+TOGGLE_KEY = pygame.K_F3
+DUMP_KEY = pygame.K_F4
+FRAME_BUDGET_MS = 1000 / 60
+
+PHASE_COLORS = [
+    (230, 85, 85), (240, 170, 60), (240, 230, 80), (110, 210, 90),
+    (70, 200, 210), (90, 130, 240), (180, 110, 230), (230, 120, 190),
+]
+
+class FrameProfiler:
+    """
+    Splits each frame into named phases with perf_counter_ns. Call
+    begin_frame(), then mark(name) at the end of every phase, then
+    end_frame(). All calls return immediately while disabled.
+    """
+    def __init__(self, enabled=None, history=HISTORY_FRAMES):
+        self.enabled = PROFILE if enabled is None else enabled
+        self.frames = deque(maxlen=history)
+        self.phase_names = []
+        self._phases = []
+        self._frame_start = 0
+        self._last = 0
+        self._font = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._phases = []
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            if event.key == TOGGLE_KEY:
+                self.toggle()
+            elif event.key == DUMP_KEY and self.frames:
+                self.dump_trace()
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._frame_start = self._last = time.perf_counter_ns()
+        self._phases = []
+
+    def mark(self, name):
+        # Closes the phase that started at the previous mark (or at begin_frame)
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        if not self._frame_start:
+            self._frame_start = self._last = now
+        self._phases.append((name, self._last, now))
+        self._last = now
+
+    def end_frame(self, counts=None):
+        if not self.enabled or not self._frame_start:
+            return
+        for name, _, _ in self._phases:
+            if name not in self.phase_names:
+                self.phase_names.append(name)
+        self.frames.append((self._frame_start, self._last, self._phases, dict(counts or {})))
+        self._frame_start = 0
+
+    # -------------------- Reporting --------------------
+    def phase_averages(self, frames=60):
+        # Mean milliseconds per phase over the most recent frames
+        recent = list(self.frames)[-frames:]
+        totals = {}
+        for _, _, phases, _ in recent:
+            for name, start, end in phases:
+                totals[name] = totals.get(name, 0) + end - start
+        return {name: totals.get(name, 0) / 1e6 / max(1, len(recent)) for name in self.phase_names}
+
+    def trace_events(self):
+        events = []
+        pid = os.getpid()
+        for index, (start, end, phases, counts) in enumerate(self.frames):
+            events.append({'name': 'frame', 'ph': 'X', 'pid': pid, 'tid': 1,
+                           'ts': start / 1000, 'dur': (end - start) / 1000, 'args': dict(counts, index=index)})
+            for name, p_start, p_end in phases:
+                events.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': 1,
+                               'ts': p_start / 1000, 'dur': (p_end - p_start) / 1000})
+            for name, value in counts.items():
+                events.append({'name': name, 'ph': 'C', 'pid': pid, 'tid': 1, 'ts': start / 1000, 'args': {name: value}})
+        return events
+
+    def dump_trace(self, path=None):
+        if path is None:
+            path = time.strftime('profile_trace_%Y%m%d_%H%M%S.json')
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    # -------------------- Overlay --------------------
+    def draw_overlay(self, surface, pos=None):
+        # Frame-time graph, per-phase bars and the latest counts; returns the rect drawn over
+        if not self.enabled or not self.frames:
+            return None
+        if self._font is None:
+            self._font = pygame.font.Font(None, 18)
+        font = self._font
+
+        width = self.frames.maxlen
+        graph_h = 60
+        averages = self.phase_averages()
+        counts = self.frames[-1][3]
+        line_h = 14
+        height = graph_h + 8 + line_h * (len(averages) + len(counts)) + 8
+        if pos is None:
+            pos = (10, surface.get_height() - height - 10)
+        panel = pygame.Rect(pos, (width + 110, height))
+
+        backdrop = pygame.Surface(panel.size, pygame.SRCALPHA)
+        backdrop.fill((0, 0, 0, 170))
+        surface.blit(backdrop, panel)
+
+        # Frame-time graph, scaled so the 60 FPS budget sits at half height
+        scale = graph_h / (FRAME_BUDGET_MS * 2)
+        base_y = panel.y + graph_h
+        for i, (start, end, _, _) in enumerate(self.frames):
+            ms = (end - start) / 1e6
+            h = min(graph_h, max(1, int(ms * scale)))
+            color = (110, 210, 90) if ms <= FRAME_BUDGET_MS else (230, 85, 85)
+            pygame.draw.line(surface, color, (panel.x + i, base_y), (panel.x + i, base_y - h))
+        budget_y = base_y - int(FRAME_BUDGET_MS * scale)
+        pygame.draw.line(surface, (255, 255, 255), (panel.x, budget_y), (panel.x + width, budget_y))
+        last_ms = (self.frames[-1][1] - self.frames[-1][0]) / 1e6
+        surface.blit(font.render(f"{last_ms:.2f} ms", True, (255, 255, 255)), (panel.x + width + 6, panel.y + 2))
+
+        # Per-phase bars
+        y = base_y + 8
+        for i, (name, ms) in enumerate(averages.items()):
+            color = PHASE_COLORS[i % len(PHASE_COLORS)]
+            bar_w = min(width, int(ms / FRAME_BUDGET_MS * width))
+            pygame.draw.rect(surface, color, (panel.x, y + 2, max(1, bar_w), line_h - 4))
+            surface.blit(font.render(f"{name} {ms:.2f}", True, (255, 255, 255)), (panel.x + width + 6, y))
+            y += line_h
+
+        for name, value in counts.items():
+            surface.blit(font.render(f"{name}: {value}", True, (255, 255, 255)), (panel.x, y))
+            y += line_h
+        return panel
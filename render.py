@@ -0,0 +1,112 @@
+import pygame
+import os
+
+# -----------------------------
+# Dirty-rect rendering
+# -----------------------------
+# Opt in with ARCADE_DIRTY_RECTS=1, e.g. on kiosk machines where pushing the
+# whole window every frame is the main CPU cost.
+DIRTY_RECTS = os.environ.get("ARCADE_DIRTY_RECTS", "0") == "1"
+
+# -----------------------------
+# Display mode and render rate
+# -----------------------------
+# ARCADE_FPS caps how often the platformer renders (0 = uncapped); the
+# simulation always runs at its own fixed rate. ARCADE_VSYNC=1 asks the
+# driver to sync presents to the display refresh instead of capping.
+RENDER_FPS = int(os.environ.get("ARCADE_FPS", "60"))
+VSYNC = os.environ.get("ARCADE_VSYNC", "0") == "1"
+
+WINDOW_SIZE = (900, 500)
+
+def get_window(size=WINDOW_SIZE, caption=None):
+    """ The one display surface every game draws to, created (with pygame itself) on first use """
+    window = pygame.display.get_surface()
+    if window is None:
+        pygame.init()
+        window = set_window_mode(size)
+    if caption is not None:
+        pygame.display.set_caption(caption)
+    return window
+
+def set_window_mode(size):
+    if VSYNC:
+        try:
+            return pygame.display.set_mode(size, pygame.SCALED, vsync=1)
+        except pygame.error:
+            # No vsync-capable renderer; fall back to a plain window
+            pass
+    return pygame.display.set_mode(size)
+
+
+class DirtyRenderer:
+    """
+    Draws a frame on top of a cached background and, in dirty mode, only
+    restores and pushes the regions that were drawn this frame or last frame.
+    With dirty=False it redraws and pushes the whole window every frame.
+    """
+    def __init__(self, window, background, dirty=None, profiler=None):
+        self.window = window
+        self.profiler = profiler
+        self.background = background
+        self.dirty = DIRTY_RECTS if dirty is None else dirty
+        self.previous = []
+        self.current = []
+        self.full_redraw = True
+
+    def set_background(self, background):
+        self.background = background
+        self.invalidate()
+
+    def invalidate(self):
+        # Next frame repaints and pushes the whole window
+        self.full_redraw = True
+
+    def handle_event(self, event):
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+            self.invalidate()
+
+    def begin(self):
+        if self.full_redraw or not self.dirty:
+            self.window.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                self.window.blit(self.background, rect, rect)
+
+    def blit(self, surf, pos, area=None):
+        rect = self.window.blit(surf, pos, area)
+        self.current.append(rect)
+        return rect
+
+    def blits(self, surf, positions, bounds=None):
+        # Many copies of one surface in one call; marks `bounds` (a rect covering them all) if given, else each copy
+        if bounds is None:
+            self.current.extend(self.window.blits([(surf, pos) for pos in positions]))
+        else:
+            self.window.blits([(surf, pos) for pos in positions], doreturn=False)
+            self.current.append(bounds)
+
+    def draw_rect(self, color, rect):
+        rect = pygame.draw.rect(self.window, color, rect)
+        self.current.append(rect)
+        return rect
+
+    def mark(self, rect):
+        self.current.append(pygame.Rect(rect))
+
+    def present(self):
+        if self.profiler is not None:
+            self.profiler.mark('draw')
+            overlay = self.profiler.draw_overlay(self.window)
+            if overlay is not None:
+                self.current.append(overlay)
+
+        if self.full_redraw or not self.dirty:
+            pygame.display.update()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.previous + self.current)
+        self.previous = self.current
+        self.current = []
+        if self.profiler is not None:
+            self.profiler.mark('display')
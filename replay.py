@@ -0,0 +1,346 @@
+import os
+
+# Keeps `python replay.py ... | python -m json.tool` clean; set before pygame prints its banner on import
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+import argparse
+import json
+import random
+import struct
+import sys
+import time
+import zlib
+
+# -----------------------------
+# Replay format
+# -----------------------------
+# A replay is the input a game session was stepped with, one word per step:
+# a bit per key the game reads, then a bit per kind of event (jump, fire,
+# restart, ...) that arrived before that step, with how many of each came
+# alongside. Input changes rarely, so only the changes are stored, as LEB128
+# varints:
+#
+#   header   magic 'ARRP', version, step count, state fingerprint, settings length
+#   settings JSON: the game name and the keyword arguments that rebuild the
+#            session, including its RNG seed
+#   runs     steps since the previous change, new word XOR previous word,
+#            then the count of each event whose bit is set
+#
+# A change at the step count itself holds events that came after the last
+# step (e.g. a restart just before quitting); playback applies them without
+# stepping. The fingerprint is a CRC of the final state, so playback can tell
+# whether it reproduced the session exactly.
+#
+# ARCADE_RECORD=<dir> records every session of every game into that directory.
+MAGIC = b'ARRP'
+VERSION = 2
+HEADER = struct.Struct('<4sHIIH')
+REPLAY_EXT = '.rpl'
+RECORD_DIR = os.environ.get("ARCADE_RECORD", "")
+
+# Per game: the keys its step reads, then its events
+GAMES = {
+    'platformer': ((pygame.K_LEFT, pygame.K_RIGHT), ('reset', 'jump')),
+    'shooter': ((pygame.K_a, pygame.K_d, pygame.K_w, pygame.K_s, pygame.K_LEFT, pygame.K_RIGHT,
+                 pygame.K_UP, pygame.K_DOWN, pygame.K_LCTRL, pygame.K_RCTRL), ('fire_yellow', 'fire_red')),
+    'dodger': ((pygame.K_a, pygame.K_d, pygame.K_w, pygame.K_s), ()),
+}
+
+class ScriptedKeys:
+    """ Stands in for pygame.key.get_pressed(): indexable by key code """
+    def __init__(self, held=()):
+        self.held = set(held)
+
+    def __getitem__(self, key):
+        return key in self.held
+
+
+def write_varint(out, value):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(buffer, pos):
+    value = shift = 0
+    while True:
+        byte = buffer[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def fingerprint(game, session):
+    # Enough of the final state that any divergence during playback shows up in it
+    if game == 'platformer':
+        player = session.player
+        state = (session.frame, player.rect.topleft, player.x_vel, player.y_vel, player.lives, player.start_pos,
+                 session.level_complete, session.game_over, len(session.level.pickups), len(session.particles))
+    elif game == 'shooter':
+        state = (session.frame, session.red.topleft, session.yellow.topleft, session.red_health, session.yellow_health,
+                 list(session.red_bullets.x[:len(session.red_bullets)]), list(session.yellow_bullets.x[:len(session.yellow_bullets)]))
+    else:
+        state = (session.frame, session.player['rect'].topleft, session.score, session.spawn_timer,
+                 [(wave[0], list(wave[3])) for wave in session.obstacles.waves])
+    return zlib.crc32(repr(state).encode('utf-8'))
+
+# -----------------------------
+# Recording
+# -----------------------------
+class ReplayRecorder:
+    """
+    Builds a replay while a session runs. The session calls press() for
+    each event as it arrives and record() at the start of every step.
+    """
+    def __init__(self, game, settings):
+        self.game = game
+        self.settings = settings
+        self.keys, self.events = GAMES[game]
+        self.frames = 0
+        self.runs = bytearray()
+        self._word = 0
+        self._counts = []
+        self._changed = 0
+        self._pressed = dict.fromkeys(self.events, 0)
+
+    def press(self, event, count=1):
+        self._pressed[event] += count
+
+    def _with_events(self, word):
+        # Adds the events pressed since the last step to a word of held keys; returns it with their counts
+        counts = []
+        for bit, event in enumerate(self.events, len(self.keys)):
+            count = self._pressed[event]
+            if count:
+                word |= 1 << bit
+                counts.append(count)
+        return word, counts
+
+    def _write_change(self, runs, word, counts):
+        write_varint(runs, self.frames - self._changed)
+        write_varint(runs, word ^ self._word)
+        for count in counts:
+            write_varint(runs, count)
+
+    def record(self, keys):
+        word = 0
+        for bit, key in enumerate(self.keys):
+            if keys[key]:
+                word |= 1 << bit
+        word, counts = self._with_events(word)
+        self._pressed = dict.fromkeys(self.events, 0)
+        if word != self._word or counts != self._counts:
+            self._write_change(self.runs, word, counts)
+            self._word, self._counts, self._changed = word, counts, self.frames
+        self.frames += 1
+
+    def encode(self, session):
+        # Events still waiting for a step go in as a change at the step count
+        word, counts = self._with_events(self._word & ((1 << len(self.keys)) - 1))
+        runs = self.runs
+        if counts:
+            runs = bytearray(runs)
+            self._write_change(runs, word, counts)
+        settings = json.dumps(dict(self.settings, game=self.game), separators=(',', ':')).encode('utf-8')
+        return HEADER.pack(MAGIC, VERSION, self.frames, fingerprint(self.game, session), len(settings)) + settings + bytes(runs)
+
+    def save(self, path, session):
+        with open(path, 'wb') as f:
+            f.write(self.encode(session))
+        return path
+
+
+def new_seed():
+    return random.randrange(1 << 32)
+
+
+def start_recording(game, settings):
+    """ A recorder for a new session of `game` if ARCADE_RECORD is set, else None """
+    return ReplayRecorder(game, settings) if RECORD_DIR else None
+
+
+def finish_recording(recorder, session):
+    # Writes <game>_<time>.rpl into ARCADE_RECORD; does nothing without a recorder
+    if recorder is None or not recorder.frames:
+        return None
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    stem = os.path.join(RECORD_DIR, f"{recorder.game}_{time.strftime('%Y%m%d_%H%M%S')}")
+    path = stem + REPLAY_EXT
+    n = 1
+    while os.path.exists(path):
+        n += 1
+        path = f"{stem}_{n}{REPLAY_EXT}"
+    return recorder.save(path, session)
+
+# -----------------------------
+# Playback
+# -----------------------------
+class Replay:
+    def __init__(self, settings, frame_count, runs, state=None):
+        self.settings = dict(settings)
+        self.game = self.settings.pop('game')
+        self.keys, self.events = GAMES[self.game]
+        self.frame_count = frame_count
+        self.runs = runs
+        self.state = state
+
+    @classmethod
+    def decode(cls, buffer):
+        magic, version, frame_count, state, settings_len = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("not a replay file")
+        if version != VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+        start = HEADER.size
+        settings = json.loads(bytes(buffer[start:start + settings_len]).decode('utf-8'))
+        return cls(settings, frame_count, bytes(buffer[start + settings_len:]), state)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.decode(f.read())
+
+    def _changes(self):
+        # (step, keys, events) for every change, in order
+        runs = self.runs
+        pos = frame = word = 0
+        while pos < len(runs):
+            delta, pos = read_varint(runs, pos)
+            diff, pos = read_varint(runs, pos)
+            frame += delta
+            word ^= diff
+            held = [key for bit, key in enumerate(self.keys) if word >> bit & 1]
+            events = {}
+            for bit, event in enumerate(self.events, len(self.keys)):
+                if word >> bit & 1:
+                    events[event], pos = read_varint(runs, pos)
+            yield frame, ScriptedKeys(held), events
+
+    def frames(self):
+        """ (keys, events) for each recorded step """
+        current = ScriptedKeys(), {}
+        changes = self._changes()
+        change = next(changes, None)
+        for frame in range(self.frame_count):
+            if change is not None and change[0] == frame:
+                current = change[1:]
+                change = next(changes, None)
+            yield current
+
+    def trailing(self):
+        # Events that came after the last step
+        for frame, _, events in self._changes():
+            if frame == self.frame_count:
+                return events
+        return {}
+
+
+def open_session(replay):
+    # The session the replay was recorded from, rebuilt from its settings
+    if replay.game == 'platformer':
+        import game
+        return game.GameSession(**replay.settings)
+    if replay.game == 'shooter':
+        import one_v_one
+        return one_v_one.ShooterMatch(**replay.settings)
+    import Space_dodger
+    return Space_dodger.DodgerGame(**replay.settings)
+
+
+def apply_events(replay, session, events):
+    if replay.game == 'platformer':
+        if events.get('reset'):
+            session.reset()
+        for _ in range(events.get('jump', 0)):
+            session.queue_jump()
+    elif replay.game == 'shooter':
+        for event, key in (('fire_yellow', pygame.K_LCTRL), ('fire_red', pygame.K_RCTRL)):
+            for _ in range(events.get(event, 0)):
+                session.handle_event(pygame.event.Event(pygame.KEYDOWN, key=key))
+
+
+def playback(replay, session=None):
+    """
+    Yields an (update, draw) pair per recorded step, like the benchmark
+    scenarios: update() feeds the step's input through the same calls the
+    game loop makes, draw() renders the frame. The session is left in
+    `replay.session` for inspection.
+    """
+    from render import DirtyRenderer, get_window
+    window = get_window()
+    session = replay.session = session or open_session(replay)
+    if replay.game == 'platformer':
+        import game
+        background = game.get_parallax_background(game.BACKGROUND_MAPPING.get(session.map_filename, 'Blue.png'))
+
+        def draw():
+            session.draw(window, background)
+            pygame.display.update()
+    else:
+        if replay.game == 'shooter':
+            import one_v_one
+            background = one_v_one.make_shooter_background(session.bg, one_v_one.BORDER)
+        else:
+            background = session.bg
+        renderer = DirtyRenderer(window, background)
+
+        def draw():
+            session.draw(renderer)
+
+    for keys, events in replay.frames():
+        def update():
+            apply_events(replay, session, events)
+            session.step(keys)
+        yield update, draw
+    apply_events(replay, session, replay.trailing())
+
+
+def play(replay, draw=False):
+    """ Plays a replay through at uncapped speed and reports how long it took and whether it reproduced the session """
+    frames = 0
+    start = time.perf_counter()
+    for update, draw_frame in playback(replay):
+        update()
+        if draw:
+            draw_frame()
+        frames += 1
+    elapsed = time.perf_counter() - start
+    state = fingerprint(replay.game, replay.session)
+    return {
+        'game': replay.game,
+        'settings': replay.settings,
+        'frames': frames,
+        'seconds': round(elapsed, 4),
+        'fps': round(frames / elapsed, 1) if elapsed > 0 else None,
+        'fingerprint': state,
+        'reproduced': state == replay.state,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back recorded game sessions (record with ARCADE_RECORD=<dir>).")
+    parser.add_argument('files', nargs='+', help=f"replay files ({REPLAY_EXT})")
+    parser.add_argument('--draw', action='store_true', help="render every frame too, not just the simulation")
+    parser.add_argument('--window', action='store_true', help="show the frames in a real window (implies --draw)")
+    args = parser.parse_args(argv)
+    if not args.window:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    status = 0
+    for path in args.files:
+        report = play(Replay.load(path), draw=args.draw or args.window)
+        report['file'] = path
+        json.dump(report, sys.stdout, indent=4)
+        print()
+        if not report['reproduced']:
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,396 @@
+import pygame
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+# -----------------------------
+# Resource path helper
+# -----------------------------
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and PyInstaller """
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+# -----------------------------
+# Decoded image cache
+# -----------------------------
+IMAGE_CACHE_BUDGET = 64 * 1024 * 1024  # bytes of decoded pixels kept resident
+
+class ImageCache:
+    """ Shared cache of decoded surfaces keyed by resolved path, evicted LRU-first """
+    def __init__(self, max_bytes=IMAGE_CACHE_BUDGET):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._seen = set()
+        self._decoded = {}  # resolved path -> surface decoded ahead of time by the prefetcher
+        self.bytes_resident = 0
+        self.hits = 0
+        self.misses = 0
+        self.repeat_decodes = 0
+        self.evictions = 0
+        self.decode_time = 0.0
+        self.prefetched = 0
+
+    @staticmethod
+    def key(path, mode):
+        return os.path.normcase(os.path.realpath(resource_path(path))), mode
+
+    def load(self, path, mode='alpha'):
+        # mode: 'alpha' -> convert_alpha(), 'opaque' -> convert(), None -> raw decode
+        key = self.key(path, mode)
+        surf = self._images.get(key)
+        if surf is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+            return surf
+
+        start = time.perf_counter()
+        surf = self._decoded.pop(key[0], None)
+        if surf is None:
+            surf = pygame.image.load(key[0])
+        else:
+            self.prefetched += 1
+        if mode == 'alpha':
+            surf = surf.convert_alpha()
+        elif mode == 'opaque':
+            surf = surf.convert()
+        self.decode_time += time.perf_counter() - start
+
+        self.misses += 1
+        if key in self._seen:
+            self.repeat_decodes += 1
+        self._seen.add(key)
+
+        self._images[key] = surf
+        self.bytes_resident += self.surface_bytes(surf)
+        self._evict()
+        return surf
+
+    def add_decoded(self, path, surf):
+        # A raw decode from another thread; the next load() of this path only converts it
+        self._decoded[path] = surf
+
+    @staticmethod
+    def surface_bytes(surf):
+        return surf.get_pitch() * surf.get_height()
+
+    def _evict(self):
+        # Never evict the most recently loaded surface, even if it alone exceeds the budget
+        while self.bytes_resident > self.max_bytes and len(self._images) > 1:
+            _, surf = self._images.popitem(last=False)
+            self.bytes_resident -= self.surface_bytes(surf)
+            self.evictions += 1
+
+    def clear(self):
+        self._images.clear()
+        self._decoded.clear()
+        self.bytes_resident = 0
+
+    def reset_stats(self):
+        self.hits = self.misses = self.repeat_decodes = self.evictions = self.prefetched = 0
+        self.decode_time = 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._images),
+            'hits': self.hits,
+            'misses': self.misses,
+            'repeat_decodes': self.repeat_decodes,
+            'evictions': self.evictions,
+            'prefetched': self.prefetched,
+            'bytes_resident': self.bytes_resident,
+            'max_bytes': self.max_bytes,
+            'decode_time': self.decode_time,
+        }
+
+
+IMAGE_CACHE = ImageCache()
+
+def load_image(path, mode='alpha'):
+    """ Decoded surfaces are shared between callers: copy before mutating one """
+    return IMAGE_CACHE.load(path, mode)
+
+# -----------------------------
+# Sound effects
+# -----------------------------
+# Every effect is decoded once per run and shared. ARCADE_AUDIO_CACHE=<dir>
+# also keeps each decoded effect's PCM samples on disk, so later runs load
+# them straight into the mixer instead of decoding the MP3 again.
+AUDIO_CACHE_DIR = os.environ.get("ARCADE_AUDIO_CACHE", "")
+
+class SoundCache:
+    """ Shared cache of decoded sounds keyed by resolved path; load() gives None while the mixer is off """
+    def __init__(self, cache_dir=AUDIO_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._sounds = {}
+        self._decoded = {}  # resolved path -> sound decoded ahead of time by the prefetcher
+        self.decodes = 0
+        self.pcm_loads = 0
+        self.prefetched = 0
+        self.decode_time = 0.0
+
+    @staticmethod
+    def key(path):
+        return os.path.normcase(os.path.realpath(resource_path(path)))
+
+    def _pcm_path(self, path):
+        # Named after the source file's identity and the mixer format, so a stale or mismatched cache is never read
+        st = os.stat(path)
+        ident = f"{path}|{st.st_size}|{st.st_mtime_ns}|{pygame.mixer.get_init()}"
+        return os.path.join(self.cache_dir, hashlib.sha1(ident.encode('utf-8')).hexdigest() + '.pcm')
+
+    def decode(self, path):
+        """ A new Sound for `path` (already resolved); safe to call from the prefetch thread """
+        pcm = self._pcm_path(path) if self.cache_dir else None
+        if pcm is not None:
+            try:
+                with open(pcm, 'rb') as f:
+                    sound = pygame.mixer.Sound(buffer=f.read())
+                self.pcm_loads += 1
+                return sound
+            except OSError:
+                pass
+        sound = pygame.mixer.Sound(path)
+        self.decodes += 1
+        if pcm is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(pcm + '.tmp', 'wb') as f:
+                    f.write(sound.get_raw())
+                os.replace(pcm + '.tmp', pcm)
+            except OSError:
+                # Read-only or full disk: the cache is only a shortcut
+                pass
+        return sound
+
+    def load(self, path):
+        key = self.key(path)
+        sound = self._sounds.get(key)
+        if sound is None and pygame.mixer.get_init():
+            start = time.perf_counter()
+            sound = self._decoded.pop(key, None)
+            if sound is None:
+                sound = self.decode(key)
+            else:
+                self.prefetched += 1
+            self.decode_time += time.perf_counter() - start
+            self._sounds[key] = sound
+        return sound
+
+    def add_decoded(self, path, sound):
+        self._decoded[path] = sound
+
+    def clear(self):
+        self._sounds.clear()
+        self._decoded.clear()
+
+
+SOUND_CACHE = SoundCache()
+
+def load_sound(path):
+    """ Decoded sounds are shared between callers, so set volume per channel rather than on the sound """
+    return SOUND_CACHE.load(path)
+
+# -----------------------------
+# Background prefetch
+# -----------------------------
+class AssetPrefetcher:
+    """
+    Reads and decodes files on a worker thread while a menu sits idle.
+    Surfaces only reach the image cache, and get converted to the display
+    format, on the main thread inside pump(). Calls queued with
+    request_call() run there too, once every file requested so far is in.
+    """
+    def __init__(self, cache=IMAGE_CACHE):
+        self.cache = cache
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = None
+        self._requested = set()
+        self._calls = deque()
+        self._json = {}
+        self.files_total = 0
+        self.files_done = 0
+        self.calls_total = 0
+        self.calls_done = 0
+
+    def _request(self, kind, path, mode=None):
+        path = os.path.normcase(os.path.realpath(resource_path(path)))
+        if (kind, path, mode) in self._requested:
+            return
+        self._requested.add((kind, path, mode))
+        self.files_total += 1
+        self._jobs.put((kind, path, mode))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name='asset-prefetch', daemon=True)
+            self._thread.start()
+
+    def request_image(self, path, mode='alpha'):
+        self._request('image', path, mode)
+
+    def request_json(self, path):
+        self._request('json', path)
+
+    def request_sound(self, path):
+        self._request('sound', path)
+
+    def request_file(self, path):
+        # Only read, so the OS has it cached when something streams it later
+        self._request('file', path)
+
+    def request_call(self, fn, key=None):
+        # Ignored while a call with the same key is still waiting to run
+        key = fn if key is None else key
+        if any(queued == key for queued, _ in self._calls):
+            return
+        self.calls_total += 1
+        self._calls.append((key, fn))
+
+    def cancel_calls(self, predicate):
+        # Drops queued calls whose key matches, e.g. work for a choice the player moved away from
+        kept = deque((key, fn) for key, fn in self._calls if not predicate(key))
+        self.calls_total -= len(self._calls) - len(kept)
+        self._calls = kept
+
+    def _work(self):
+        while True:
+            kind, path, mode = self._jobs.get()
+            value = None
+            try:
+                if kind == 'image':
+                    value = pygame.image.load(path)
+                elif kind == 'json':
+                    with open(path, 'r') as f:
+                        value = json.load(f)
+                elif kind == 'sound':
+                    if pygame.mixer.get_init():
+                        value = SOUND_CACHE.decode(path)
+                else:
+                    with open(path, 'rb') as f:
+                        f.read()
+            except (OSError, ValueError, pygame.error):
+                # The regular loader will hit the same problem and report it
+                pass
+            self._results.put((kind, path, mode, value))
+
+    def pump(self, budget=0.004):
+        """ Moves finished work into place for up to `budget` seconds; True once nothing is outstanding """
+        deadline = time.perf_counter() + budget
+        while time.perf_counter() < deadline:
+            try:
+                kind, path, mode, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if value is not None:
+                if kind == 'image':
+                    self.cache.add_decoded(path, value)
+                    self.cache.load(path, mode)
+                elif kind == 'json':
+                    self._json[path] = value
+                elif kind == 'sound':
+                    SOUND_CACHE.add_decoded(path, value)
+            self.files_done += 1
+        while self._calls and self.files_done == self.files_total and time.perf_counter() < deadline:
+            _, fn = self._calls.popleft()
+            fn()
+            self.calls_done += 1
+        return self.ready()
+
+    def ready(self):
+        return self.files_done == self.files_total and not self._calls
+
+    def progress(self):
+        total = self.files_total + self.calls_total
+        return (self.files_done + self.calls_done) / total if total else 1.0
+
+    def get_json(self, path):
+        """ Parsed contents of a prefetched JSON file, or None; shared, so do not mutate it """
+        return self._json.get(os.path.normcase(os.path.realpath(resource_path(path))))
+
+
+PREFETCHER = AssetPrefetcher()
+
+# -----------------------------
+# Fonts
+# -----------------------------
+_fonts = {}
+
+def load_font(path, size):
+    """ Fonts are opened on first use and shared by every module that asks for the same file and size """
+    key = (os.path.normcase(os.path.realpath(resource_path(path))), size)
+    font = _fonts.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = _fonts[key] = pygame.font.Font(key[0], size)
+    return font
+
+# -----------------------------
+# Text
+# -----------------------------
+TEXT_CACHE_SIZE = 256   # rendered strings kept
+
+class TextCache:
+    """ Rendered text surfaces keyed by font, string, antialiasing and colour, evicted LRU-first """
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, antialias, color)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = self._surfaces[key] = font.render(text, antialias, color)
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._surfaces.clear()
+
+
+TEXT_CACHE = TextCache()
+
+def render_text(font, text, color, antialias=True):
+    """ font.render() through the shared cache; like load_image, the result is shared, so copy before mutating """
+    return TEXT_CACHE.render(font, text, color, antialias)
+
+
+class GlyphStrip:
+    """
+    A counter's characters rendered once, then laid out by blitting them side
+    by side, so a number that changes every frame never goes through the font
+    renderer. Only for characters without kerning between them, like digits.
+    """
+    def __init__(self, font, color, chars='0123456789', antialias=True):
+        self.glyphs = {c: font.render(c, antialias, color) for c in chars}
+        self.height = font.get_height()
+
+    def width(self, text):
+        glyphs = self.glyphs
+        return sum(glyphs[c].get_width() for c in text)
+
+    def draw(self, target, text, pos):
+        # `target` is anything with blit(surface, pos): a Surface or a DirtyRenderer; returns the x after the text
+        x, y = pos
+        glyphs = self.glyphs
+        for c in text:
+            glyph = glyphs[c]
+            target.blit(glyph, (x, y))
+            x += glyph.get_width()
+        return x
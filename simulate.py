@@ -0,0 +1,173 @@
+import os
+
+# Headless: no window, no sound card. Must be set before pygame is imported.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+import argparse
+import json
+import sys
+import time
+
+import game
+from render import get_window
+from level_format import find_level_file
+from resources import resource_path
+from replay import ScriptedKeys
+
+FRAMES_DEFAULT = game.FPS * 60
+
+# -----------------------------
+# Scripted input
+# -----------------------------
+KEY_NAMES = {
+    'left': pygame.K_LEFT,
+    'right': pygame.K_RIGHT,
+    'up': pygame.K_UP,
+    'down': pygame.K_DOWN,
+}
+
+class InputScript:
+    """
+    Scripted input for the platformer, one command per line:
+
+        <frame> [left] [right] [up] [down] [jump]
+
+    Held keys stay down from that frame until the next line. `jump` is a
+    single KEYDOWN for space on that frame only. Blank lines and lines
+    starting with # are ignored.
+    """
+    def __init__(self, entries=()):
+        # frame -> (held key codes, jump)
+        self.entries = dict(entries)
+
+    @classmethod
+    def parse(cls, text):
+        entries = {}
+        for line_no, line in enumerate(text.splitlines(), 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            frame, *tokens = line.split()
+            held = set()
+            jump = False
+            for token in tokens:
+                token = token.lower()
+                if token == 'jump':
+                    jump = True
+                elif token in KEY_NAMES:
+                    held.add(KEY_NAMES[token])
+                else:
+                    raise ValueError(f"line {line_no}: unknown input '{token}'")
+            entries[int(frame)] = (held, jump)
+        return cls(entries)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls.parse(f.read())
+
+    def frames(self, count):
+        # Yields (keys, jump) for frames 0 .. count-1
+        keys = ScriptedKeys()
+        for frame in range(count):
+            entry = self.entries.get(frame)
+            jump = False
+            if entry is not None:
+                keys = ScriptedKeys(entry[0])
+                jump = entry[1]
+            yield keys, jump
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def resolve_level(path):
+    # The file as given (relative to the current directory or absolute), else a map in assets/Maps; None if neither exists
+    found = find_level_file(path) or find_level_file(resource_path(os.path.join("assets", "Maps", path)))
+    # Absolute, so load_map's join with assets/Maps leaves it alone
+    return os.path.abspath(found) if found else None
+
+
+def run_simulation(map_filename, script, frames, stop_on_complete=True):
+    """ Steps a level exactly like game.main does, as fast as possible, and reports the end state """
+    path = resolve_level(map_filename)
+    if path is None:
+        raise FileNotFoundError(f"no level file '{map_filename}' here or in assets/Maps")
+    get_window()
+    session = game.GameSession(path)
+    game_overs = 0
+    completed_at = None
+
+    start = time.perf_counter()
+    run_frames = 0
+    for keys, jump in script.frames(frames):
+        if jump:
+            session.jump()
+        session.step(keys)
+        run_frames += 1
+
+        if session.level_complete and completed_at is None:
+            completed_at = session.frame
+            if stop_on_complete:
+                break
+        # main() waits two seconds here; the simulation resets straight away
+        if session.game_over:
+            game_overs += 1
+            session.reset()
+    elapsed = time.perf_counter() - start
+
+    report = session_report(session, run_frames, elapsed, game_overs, completed_at)
+    report['map'] = map_filename
+    return report
+
+
+def session_report(session, run_frames, elapsed, game_overs=0, completed_at=None):
+    player = session.player
+    level = session.level
+    return {
+        'map': session.map_filename,
+        'frames': run_frames,
+        'seconds': round(elapsed, 4),
+        'fps': round(run_frames / elapsed, 1) if elapsed > 0 else None,
+        'level_complete': session.level_complete,
+        'completed_at_frame': completed_at,
+        'game_overs': game_overs,
+        'player': {
+            'x': player.rect.x,
+            'y': player.rect.y,
+            'x_vel': player.x_vel,
+            'y_vel': player.y_vel,
+            'lives': player.lives,
+            'checkpoint': list(player.start_pos),
+            'terrain': player.current_terrain_effect,
+            'jump_boost': player.jump_boost,
+            'melon_active': player.melon_active,
+        },
+        'pickups_left': [o.name for o in level.pickups],
+        'objects': len(level),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the platformer headlessly with scripted input.")
+    parser.add_argument('level', help="map file name, e.g. level_data_3.json")
+    parser.add_argument('--input', help="input script (see InputScript); default holds nothing")
+    parser.add_argument('--frames', type=int, default=FRAMES_DEFAULT)
+    parser.add_argument('--keep-going', action='store_true', help="keep stepping after the level is completed")
+    args = parser.parse_args(argv)
+
+    script = InputScript.load(args.input) if args.input else InputScript()
+    try:
+        report = run_simulation(args.level, script, args.frames, stop_on_complete=not args.keep_going)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    json.dump(report, sys.stdout, indent=4)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())